@@ -54,10 +54,13 @@ async def process_request(request: ExampleRequest):
 if __name__ == "__main__":
     print("🚀 Starting My Service...")
     
-    # Run the server
+    # Run the server (uvloop + httptools require uvicorn[standard])
     uvicorn.run(
-        app, 
-        host="0.0.0.0", 
+        "app:app",
+        host="0.0.0.0",
         port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=1,
         log_level="info"
     )
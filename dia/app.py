@@ -8,6 +8,11 @@ import requests
 import base64
 from typing import Optional, Literal
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Read size used when streaming audio responses to disk
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 class DiaClient:
@@ -21,6 +26,30 @@ class DiaClient:
             base_url: Base URL of the Dia API server
         """
         self.base_url = base_url.rstrip('/')
+        
+        # Reuse one keep-alive connection pool instead of opening a new
+        # TCP connection for every request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # The non-verbal list is static for the life of the server
+        self._nonverbals = None
+    
+    def close(self):
+        """Close the underlying HTTP session"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def health_check(self) -> dict:
         """
@@ -29,7 +58,7 @@ class DiaClient:
         Returns:
             Health status information
         """
-        response = requests.get(f"{self.base_url}/health")
+        response = self.session.get(f"{self.base_url}/health")
         response.raise_for_status()
         return response.json()
     
@@ -72,35 +101,45 @@ class DiaClient:
         if seed is not None:
             payload["seed"] = seed
         
-        response = requests.post(
+        # The with block returns the pooled connection even when
+        # raise_for_status() fails on a streamed response
+        with self.session.post(
             f"{self.base_url}/generate",
-            json=payload
-        )
-        response.raise_for_status()
-        
-        # Handle different output formats
-        if output_format == "base64":
-            result = response.json()
+            json=payload,
+            stream=True
+        ) as response:
+            response.raise_for_status()
             
-            # Optionally save to file
-            if save_path:
-                audio_data = base64.b64decode(result["audio_base64"])
-                with open(save_path, 'wb') as f:
-                    f.write(audio_data)
-                print(f"✅ Audio saved to {save_path}")
+            # Handle different output formats
+            if output_format == "base64":
+                result = response.json()
+                
+                # Optionally save to file
+                if save_path:
+                    audio_data = base64.b64decode(result["audio_base64"])
+                    with open(save_path, 'wb') as f:
+                        f.write(audio_data)
+                    print(f"✅ Audio saved to {save_path}")
+                
+                return result
             
-            return result
-        else:
-            # Binary audio response
+            # Binary audio response - write chunks as they arrive instead of
+            # buffering the whole body in memory
+            size_bytes = 0
             if save_path:
                 with open(save_path, 'wb') as f:
-                    f.write(response.content)
+                    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        f.write(chunk)
+                        size_bytes += len(chunk)
                 print(f"✅ Audio saved to {save_path}")
+            else:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    size_bytes += len(chunk)
             
             return {
                 "message": "Audio generated successfully",
                 "content_type": response.headers.get('content-type'),
-                "size_bytes": len(response.content)
+                "size_bytes": size_bytes
             }
     
     def list_nonverbals(self) -> dict:
@@ -108,11 +147,13 @@ class DiaClient:
         List supported non-verbal sound effects
         
         Returns:
-            Dictionary with list of non-verbal tags
+            Dictionary with list of non-verbal tags (fetched once, then cached)
         """
-        response = requests.get(f"{self.base_url}/nonverbals")
-        response.raise_for_status()
-        return response.json()
+        if self._nonverbals is None:
+            response = self.session.get(f"{self.base_url}/nonverbals")
+            response.raise_for_status()
+            self._nonverbals = response.json()
+        return self._nonverbals
 
 
 # Example usage
@@ -4,17 +4,29 @@ Dia TTS API Server
 Text-to-dialogue generation with voice control and non-verbal sounds
 """
 
-import os
 import io
-import base64
+import re
+import json
+import asyncio
+import hashlib
 import logging
-from typing import Optional, List
-from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Literal
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
-from pydantic import BaseModel, Field
-import torch
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+import numpy as np
+import soundfile as sf
+import lameenc
+import orjson
+import pybase64
+
+# torch is imported lazily (see _torch) - it is by far the heaviest import and
+# only needed once the model is being loaded
+torch = None
 
 # Configure logging
 logging.basicConfig(
@@ -27,18 +39,38 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Dia TTS API",
     description="Text-to-dialogue generation with voice control and non-verbal sounds",
-    version="1.6B-0626"
+    version="1.6B-0626",
+    default_response_class=ORJSONResponse
 )
 
 # Global model variable
 model = None
 
+# Matches either speaker tag in a single scan
+SPEAKER_TAG_RE = re.compile(r"\[S[12]\]")
+
+# Dia's native sample rate (DEFAULT_SAMPLE_RATE)
+DIA_SAMPLE_RATE = 44100
+
+# Number of generated clips kept in the in-memory response cache
+RESPONSE_CACHE_SIZE = 128
+
+# Block size used when streaming binary audio to the client
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Micro-batching: concurrent requests with identical sampling parameters are
+# collected for up to BATCH_MAX_WAIT_MS and run as one model.generate() call
+BATCH_MAX_SIZE = 4
+BATCH_MAX_WAIT_MS = 20
+
 # Request/Response Models
 class GenerateRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     text: str = Field(
         ...,
         description="Text with speaker tags [S1] and [S2]. Include non-verbals like (laughs), (coughs), etc.",
-        example="[S1] Hello! How are you? [S2] I'm doing great! (laughs) [S1] That's wonderful to hear!"
+        json_schema_extra={"example": "[S1] Hello! How are you? [S2] I'm doing great! (laughs) [S1] That's wonderful to hear!"}
     )
     cfg_scale: float = Field(
         default=3.0,
@@ -66,11 +98,10 @@ class GenerateRequest(BaseModel):
     )
     seed: Optional[int] = Field(
         default=None,
-        description="Random seed for reproducibility"
+        description="Random seed for reproducibility (defaults to a hash of the text)"
     )
-    output_format: str = Field(
+    output_format: Literal["mp3", "wav", "base64"] = Field(
         default="mp3",
-        pattern="^(mp3|wav|base64)$",
         description="Output format: mp3, wav, or base64 (base64 returns WAV in base64)"
     )
 
@@ -88,18 +119,27 @@ class HealthResponse(BaseModel):
     model_name: str = "nari-labs/Dia-1.6B-0626"
     vram_usage: str = "~4.4GB (FP16)"
 
+def _torch():
+    """Import torch on first use and bind it to the module global"""
+    global torch
+    if torch is None:
+        import torch as _t
+        torch = _t
+    return torch
+
 def initialize_model():
     """Initialize Dia model"""
     global model
     
     logger.info("Initializing Dia model...")
+    _torch()
     
     # Check ROCm availability
     if not torch.cuda.is_available():
         logger.error("ROCm/CUDA not available - cannot run Dia")
         raise RuntimeError("ROCm/CUDA not available")
     
-    logger.info(f"Using device: {torch.cuda.get_device_name(0)}")
+    logger.info("Using device: %s", torch.cuda.get_device_name(0))
     
     try:
         # Import Dia
@@ -113,10 +153,32 @@ def initialize_model():
         )
         logger.info("Model loaded successfully!")
         
+        # Let MIOpen autotune kernels, then run one tiny generation so the
+        # first real request doesn't pay kernel selection / cache fill cost
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True  # No-op on ROCm, harmless
+        torch.set_float32_matmul_precision('high')
+        
+        logger.info("Warming up...")
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    "[S1] warm up. [S1]",
+                    use_torch_compile=False,
+                    verbose=False,
+                    cfg_scale=1.0,
+                    temperature=1.0,
+                    top_p=1.0,
+                    cfg_filter_top_k=1,
+                )
+            logger.info("Warm-up complete")
+        except Exception as e:
+            logger.warning("Warm-up failed (continuing): %s", e)
+        
         return True
         
     except Exception as e:
-        logger.error(f"Failed to initialize model: {e}")
+        logger.error("Failed to initialize model: %s", e)
         raise
 
 @app.on_event("startup")
@@ -125,32 +187,316 @@ async def startup_event():
     try:
         initialize_model()
     except Exception as e:
-        logger.error(f"Startup failed: {e}")
+        logger.error("Startup failed: %s", e)
         raise RuntimeError(f"Failed to initialize Dia model: {e}")
+    
+    # Per-request access logging is measurable overhead under load
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    
+    # Single worker so GPU calls serialize (Dia is not thread-safe against
+    # itself) while the event loop stays free for /health and new requests
+    app.state.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dia-gpu")
+    
+    # LRU cache of generated audio: key -> (audio_bytes, media_type, duration, sample_rate, base64_or_None)
+    app.state.response_cache = OrderedDict()
+    app.state.response_cache_lock = asyncio.Lock()
+    
+    # /health and / are polled often and never change while the model is
+    # loaded, so serialize them once
+    app.state.health_bytes = orjson.dumps(_health_payload())
+    app.state.root_bytes = orjson.dumps(ROOT_INFO)
+    
+    # Pending (text, request, seed, future) jobs consumed by the batch worker
+    app.state.gen_queue = asyncio.Queue()
+    app.state.batch_worker = asyncio.create_task(_batch_worker())
 
-@app.get("/", response_model=dict)
-async def root():
-    """Root endpoint"""
-    return {
-        "service": "Dia TTS API",
-        "version": "1.6B-0626",
-        "model": "nari-labs/Dia-1.6B-0626",
-        "endpoints": {
-            "/health": "Health check",
-            "/generate": "Generate dialogue audio (POST)",
-            "/docs": "API documentation"
-        }
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the batch worker and release the inference worker thread"""
+    worker = getattr(app.state, "batch_worker", None)
+    if worker is not None:
+        worker.cancel()
+    executor = getattr(app.state, "executor", None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+ROOT_INFO = {
+    "service": "Dia TTS API",
+    "version": "1.6B-0626",
+    "model": "nari-labs/Dia-1.6B-0626",
+    "endpoints": {
+        "/health": "Health check",
+        "/generate": "Generate dialogue audio (POST)",
+        "/docs": "API documentation"
     }
+}
 
-@app.get("/health", response_model=HealthResponse)
-async def health():
-    """Health check endpoint"""
+# Static for the life of the process - serialized once at import
+NONVERBALS_JSON_BYTES = orjson.dumps({
+    "nonverbals": [
+        "(laughs)", "(clears throat)", "(sighs)", "(gasps)", "(coughs)",
+        "(singing)", "(sings)", "(mumbles)", "(beep)", "(groans)",
+        "(sniffs)", "(claps)", "(screams)", "(inhales)", "(exhales)",
+        "(applause)", "(burps)", "(humming)", "(sneezes)", "(chuckle)",
+        "(whistles)"
+    ],
+    "usage": "Insert these tags in your text where you want the sound effect",
+    "example": "[S1] That's hilarious! (laughs) [S2] I know, right? (chuckle)"
+})
+
+def _health_payload() -> dict:
+    """Current health status as a plain dict"""
+    torch = _torch()
     return HealthResponse(
         status="healthy" if model is not None else "unhealthy",
         model_loaded=model is not None,
         device=torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU",
         rocm_available=torch.cuda.is_available()
-    )
+    ).model_dump()
+
+@app.get("/")
+def root():
+    """Root endpoint"""
+    return Response(content=app.state.root_bytes, media_type="application/json")
+
+@app.get("/health")
+def health():
+    """Health check endpoint"""
+    if model is None:
+        return ORJSONResponse(_health_payload())
+    return Response(content=app.state.health_bytes, media_type="application/json")
+
+def _fnv1a_32(data: bytes) -> int:
+    """32-bit FNV-1a hash, used to derive a stable seed from the prompt text"""
+    h = 0x811c9dc5
+    for byte in data:
+        h ^= byte
+        h = (h * 0x01000193) & 0xFFFFFFFF
+    return h
+
+def _cache_key(text: str, request: GenerateRequest, seed: int) -> str:
+    """Hash every parameter that affects the generated audio"""
+    payload = {
+        "text": text,
+        "cfg_scale": request.cfg_scale,
+        "temperature": request.temperature,
+        "top_p": request.top_p,
+        "top_k": request.top_k,
+        "seed": seed,
+        "output_format": request.output_format,
+    }
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def _encode_mp3(audio_i16: np.ndarray, sample_rate: int) -> tuple[bytes, str]:
+    """Encode int16 PCM to MP3 in memory"""
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(128)
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(1)
+    encoder.set_quality(2)
+    pcm16 = audio_i16.astype('<i2', copy=False).tobytes()
+    return encoder.encode(pcm16) + encoder.flush(), "audio/mpeg"
+
+def _encode_wav(audio_i16: np.ndarray, sample_rate: int) -> tuple[bytes, str]:
+    """Encode int16 PCM to a WAV file in memory"""
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_i16, sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue(), "audio/wav"
+
+# Encoder per output format, chosen once instead of probed per request
+# (base64 returns WAV in base64)
+ENCODERS = {
+    "mp3": _encode_mp3,
+    "wav": _encode_wav,
+    "base64": _encode_wav,
+}
+
+def _encode_audio(output, output_format: str) -> tuple[bytes, str, float]:
+    """
+    Encode one generated clip.
+    
+    Returns:
+        (audio_bytes, media_type, duration_seconds)
+    """
+    # Calculate duration - Dia uses 44100 Hz sample rate
+    sample_rate = DIA_SAMPLE_RATE
+    # Handle different output types
+    if isinstance(output, (list, tuple)):
+        audio_tensor = output[0] if len(output) > 0 else output
+    else:
+        audio_tensor = output
+    
+    if isinstance(audio_tensor, torch.Tensor):
+        audio_tensor = audio_tensor.detach().squeeze()
+        # Quantize on the GPU so only int16 samples cross to the host; the
+        # in-place clamp_/mul_ avoid an extra audio-sized temporary
+        if audio_tensor.dtype != torch.int16:
+            audio_tensor = audio_tensor.float().clamp_(-1.0, 1.0).mul_(32767.0).to(torch.int16)
+        audio_i16 = audio_tensor.contiguous().cpu().numpy()
+    else:
+        audio_i16 = np.asarray(audio_tensor).squeeze()
+        if audio_i16.dtype != np.int16:
+            # Scale in float32: in-place multiply on integer arrays would fail
+            audio_f32 = np.clip(audio_i16.astype(np.float32, copy=False), -1.0, 1.0)
+            audio_f32 *= 32767.0
+            audio_i16 = audio_f32.astype(np.int16)
+    
+    duration = audio_i16.shape[0] / sample_rate
+    
+    audio_bytes, media_type = ENCODERS[output_format](audio_i16, sample_rate)
+    return audio_bytes, media_type, duration
+
+@contextmanager
+def _per_sample_sampling(seeds: list[int]):
+    """
+    Give each sample in a batch its own seeded RNG for token sampling.
+    
+    Dia samples every decoder step with one torch.multinomial call over a
+    (batch * channels, vocab) probability matrix laid out batch-major, so
+    all samples share the global RNG. While active, that call is split
+    into one contiguous row block per sample, each drawn from a generator
+    seeded with that sample's seed, so a clip's token draws never depend
+    on what it was batched with. The clip itself is only bitwise
+    reproducible for the same batch: batch size changes GEMM shapes, which
+    can shift logits slightly and so change a draw. A call that cannot be
+    split per sample falls back to the global RNG with a warning. Only the
+    inference worker thread samples, so swapping the module attribute is
+    safe.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    generators = [torch.Generator(device=device).manual_seed(seed) for seed in seeds]
+    multinomial = torch.multinomial
+    warned = False
+    
+    def per_sample_multinomial(probs, num_samples, replacement=False, *, generator=None, out=None):
+        nonlocal warned
+        if generator is not None or out is not None:
+            return multinomial(probs, num_samples, replacement, generator=generator, out=out)
+        if probs.dim() != 2 or probs.shape[0] % len(generators):
+            if not warned:
+                logger.warning(
+                    "Sampling call with probs shape %s can't be split across %d samples; "
+                    "using the shared RNG, so clips in this batch are not seeded independently",
+                    tuple(probs.shape), len(generators),
+                )
+                warned = True
+            return multinomial(probs, num_samples, replacement)
+        rows = probs.shape[0] // len(generators)
+        return torch.cat([
+            multinomial(block, num_samples, replacement, generator=g)
+            for block, g in zip(probs.split(rows), generators)
+        ])
+    
+    torch.multinomial = per_sample_multinomial
+    try:
+        yield
+    finally:
+        torch.multinomial = multinomial
+
+def _run_generate_batch_sync(jobs: list) -> list[tuple[bytes, str, float]]:
+    """
+    Run Dia inference for a batch of jobs sharing sampling parameters (blocking).
+    
+    Executed on the inference worker thread so the event loop is never
+    blocked by GPU work or encoding. Each (text, seed) pair is one sample;
+    duplicates within a batch are generated once.
+    
+    Returns:
+        One (audio_bytes, media_type, duration_seconds) tuple per job
+    """
+    _, request, _, _ = jobs[0]
+    samples = list(dict.fromkeys((text, job_seed) for text, _, job_seed, _ in jobs))
+    texts = [text for text, _ in samples]
+    
+    # Seed the global RNG too, for anything Dia draws outside token sampling.
+    # Those draws are shared by the whole batch, so derive the seed from every
+    # sample's seed (order-independent), not from whichever job came first
+    seeds = sorted(job_seed for _, job_seed in samples)
+    batch_seed = seeds[0] if len(seeds) == 1 else _fnv1a_32(",".join(map(str, seeds)).encode())
+    torch.manual_seed(batch_seed)
+    if torch.cuda.is_available():
+        torch.cuda.manual_seed(batch_seed)
+    
+    # Generate audio - Dia accepts a list of texts and returns one clip per text.
+    # inference_mode skips autograd bookkeeping (grad mode is per-thread, so
+    # it has to be entered here on the worker thread)
+    with torch.inference_mode(), _per_sample_sampling([job_seed for _, job_seed in samples]):
+        output = model.generate(
+            texts if len(texts) > 1 else texts[0],
+            use_torch_compile=False,  # Disable for compatibility
+            verbose=False,
+            cfg_scale=request.cfg_scale,
+            temperature=request.temperature,
+            top_p=request.top_p,
+            cfg_filter_top_k=request.top_k,
+        )
+        outputs = dict(zip(samples, output)) if len(samples) > 1 else {samples[0]: output}
+        
+        results = [
+            _encode_audio(outputs[(text, job_seed)], job_request.output_format)
+            for text, job_request, job_seed, _ in jobs
+        ]
+    
+    # base64 callers keep only the encoded bytes, so hand the peak VRAM back
+    # to the allocator before the next request
+    del output, outputs
+    if any(job_request.output_format == "base64" for _, job_request, _, _ in jobs):
+        torch.cuda.empty_cache()
+    
+    return results
+
+def _sampling_key(job) -> tuple:
+    """
+    Jobs can share a forward pass when every sampling parameter matches.
+    Seeds differ freely - _per_sample_sampling seeds each sample on its own.
+    """
+    _, request, _, _ = job
+    return (request.cfg_scale, request.temperature, request.top_p, request.top_k)
+
+async def _batch_worker():
+    """Collect queued jobs into micro-batches and fan results back to their futures"""
+    queue = app.state.gen_queue
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + BATCH_MAX_WAIT_MS / 1000
+        while len(batch) < BATCH_MAX_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # Skip jobs whose client already went away
+        batch = [job for job in batch if not job[3].done()]
+        
+        groups = {}
+        for job in batch:
+            groups.setdefault(_sampling_key(job), []).append(job)
+        
+        for jobs in groups.values():
+            if len(jobs) > 1:
+                logger.info("Running batch of %d requests", len(jobs))
+            try:
+                results = await loop.run_in_executor(app.state.executor, _run_generate_batch_sync, jobs)
+            except Exception as e:
+                for job in jobs:
+                    if not job[3].done():
+                        job[3].set_exception(e)
+                continue
+            for job, result in zip(jobs, results):
+                if not job[3].done():
+                    job[3].set_result(result)
+
+async def _iter_audio_chunks(audio_data: bytes):
+    """Yield encoded audio in fixed-size blocks so playback can start before the full body arrives"""
+    view = memoryview(audio_data)
+    for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield bytes(view[offset:offset + STREAM_CHUNK_SIZE])
+        await asyncio.sleep(0)
 
 @app.post("/generate")
 async def generate_audio(request: GenerateRequest):
@@ -161,7 +507,7 @@ async def generate_audio(request: GenerateRequest):
         raise HTTPException(status_code=503, detail="Model not initialized")
     
     # Validate text format
-    if "[S1]" not in request.text and "[S2]" not in request.text:
+    if not SPEAKER_TAG_RE.search(request.text):
         raise HTTPException(
             status_code=400,
             detail="Text must include speaker tags [S1] and/or [S2]"
@@ -188,54 +534,42 @@ async def generate_audio(request: GenerateRequest):
             text = text + " [S1]"
         logger.info("Added ending speaker tag to improve audio quality")
     
+    # Without an explicit seed, derive one from the text so identical prompts
+    # are reproducible and can be served from the cache
+    seed = request.seed if request.seed is not None else _fnv1a_32(text.encode()) & 0xFFFFFFFF
+    key = _cache_key(text, request, seed)
+    
     try:
-        logger.info(f"Generating audio for: {text[:100]}...")
-        
-        # Set seed if provided
-        if request.seed is not None:
-            torch.manual_seed(request.seed)
-            if torch.cuda.is_available():
-                torch.cuda.manual_seed(request.seed)
-        
-        # Generate audio
-        output = model.generate(
-            text,
-            use_torch_compile=False,  # Disable for compatibility
-            verbose=False,
-            cfg_scale=request.cfg_scale,
-            temperature=request.temperature,
-            top_p=request.top_p,
-            cfg_filter_top_k=request.top_k,
-        )
+        cache = app.state.response_cache
+        async with app.state.response_cache_lock:
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
         
-        # Calculate duration - Dia uses 44100 Hz sample rate
-        sample_rate = 44100  # Dia's native sample rate (DEFAULT_SAMPLE_RATE)
-        # Handle different output types
-        if isinstance(output, (list, tuple)):
-            audio_tensor = output[0] if len(output) > 0 else output
+        cache_hit = cached is not None
+        if cache_hit:
+            audio_data, media_type, duration, sample_rate, audio_base64 = cached
         else:
-            audio_tensor = output
-        
-        # Ensure tensor is on CPU and get length
-        if hasattr(audio_tensor, 'cpu'):
-            audio_tensor = audio_tensor.cpu()
-        if hasattr(audio_tensor, 'squeeze'):
-            audio_tensor = audio_tensor.squeeze()
-        
-        duration = len(audio_tensor) / sample_rate if hasattr(audio_tensor, '__len__') else 0
+            logger.info("Generating audio for: %.100s...", text)
+            
+            future = asyncio.get_running_loop().create_future()
+            await app.state.gen_queue.put((text, request, seed, future))
+            audio_data, media_type, duration = await future
+            sample_rate = DIA_SAMPLE_RATE
+            audio_base64 = None
+            if request.output_format == "base64":
+                audio_base64 = pybase64.b64encode_as_string(audio_data)  # SIMD encoder, straight to str
+            
+            async with app.state.response_cache_lock:
+                cache[key] = (audio_data, media_type, duration, sample_rate, audio_base64)
+                cache.move_to_end(key)
+                while len(cache) > RESPONSE_CACHE_SIZE:
+                    cache.popitem(last=False)
         
-        logger.info(f"Generated {duration:.2f}s of audio")
+        logger.info("Generated %.2fs of audio (cache_hit=%s)", duration, cache_hit)
         
         # Return based on format
         if request.output_format == "base64":
-            # Save to WAV in memory
-            import soundfile as sf
-            import numpy as np
-            buffer = io.BytesIO()
-            audio_np = audio_tensor.numpy() if hasattr(audio_tensor, 'numpy') else np.array(audio_tensor)
-            sf.write(buffer, audio_np, sample_rate, format='WAV')
-            audio_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
             return GenerateResponse(
                 audio_base64=audio_base64,
                 message="Audio generated successfully",
@@ -243,58 +577,32 @@ async def generate_audio(request: GenerateRequest):
                 sample_rate=sample_rate
             )
         else:
-            # Save to file and return binary
-            import tempfile
-            import numpy as np
-            audio_np = audio_tensor.numpy() if hasattr(audio_tensor, 'numpy') else np.array(audio_tensor)
-            
-            with tempfile.NamedTemporaryFile(suffix=f".{request.output_format}", delete=False) as tmp:
-                # Use model's save function if available, otherwise use soundfile
-                try:
-                    model.save_audio(tmp.name, output)
-                except:
-                    import soundfile as sf
-                    sf.write(tmp.name, audio_np, sample_rate)
-                tmp_path = tmp.name
-            
-            # Read and return binary
-            with open(tmp_path, 'rb') as f:
-                audio_data = f.read()
-            
-            # Clean up
-            os.unlink(tmp_path)
-            
-            media_type = "audio/mpeg" if request.output_format == "mp3" else "audio/wav"
-            return Response(content=audio_data, media_type=media_type)
+            return StreamingResponse(_iter_audio_chunks(audio_data), media_type=media_type)
         
     except Exception as e:
-        logger.error(f"Generation failed: {e}")
+        logger.error("Generation failed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/nonverbals")
-async def list_nonverbals():
+def list_nonverbals():
     """List supported non-verbal tags"""
-    return {
-        "nonverbals": [
-            "(laughs)", "(clears throat)", "(sighs)", "(gasps)", "(coughs)",
-            "(singing)", "(sings)", "(mumbles)", "(beep)", "(groans)",
-            "(sniffs)", "(claps)", "(screams)", "(inhales)", "(exhales)",
-            "(applause)", "(burps)", "(humming)", "(sneezes)", "(chuckle)",
-            "(whistles)"
-        ],
-        "usage": "Insert these tags in your text where you want the sound effect",
-        "example": "[S1] That's hilarious! (laughs) [S2] I know, right? (chuckle)"
-    }
+    return Response(content=NONVERBALS_JSON_BYTES, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
     
     logger.info("Starting Dia TTS API Server...")
-    logger.info(f"ROCm available: {torch.cuda.is_available()}")
+    logger.info("ROCm available: %s", _torch().cuda.is_available())
     
+    # uvloop + httptools for C-level event loop and HTTP parsing. One worker:
+    # the model pins the GPU and must only be loaded once
     uvicorn.run(
-        app,
+        "dia_api:app",
         host="0.0.0.0",
         port=8002,
-        log_level="info"
+        loop="uvloop",
+        http="httptools",
+        workers=1,
+        log_level="warning",
+        access_log=False
     )
@@ -64,6 +64,13 @@ else
     echo "✅ Dia already installed"
 fi
 
+# API encoding dependencies - checked separately so containers that already
+# have Dia installed still pick them up
+if ! python3 -c "import lameenc, orjson, pybase64" 2>/dev/null; then
+    echo "📦 Installing API encoding dependencies..."
+    pip install --no-cache-dir -q lameenc orjson pybase64
+fi
+
 # Verify installation
 echo ""
 echo "🔍 Verifying installation..."
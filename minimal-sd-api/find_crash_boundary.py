@@ -7,14 +7,18 @@ Tests various resolution combinations to determine if crashes are:
 3. Individual dimension dependent (width or height threshold)
 """
 
-import requests
+import asyncio
+import aiohttp
 import time
 import json
 from datetime import datetime
 
 API_URL = "http://localhost:8000/generate"
 
-def test_resolution(width, height, description=""):
+# The SD server is the scarce resource - never have more than this many probes in flight
+MAX_CONCURRENT_PROBES = 2
+
+async def test_resolution(session, sem, width, height, description=""):
     """Test a specific resolution"""
     pixels = width * height
     print(f"\n{'='*60}")
@@ -32,25 +36,27 @@ def test_resolution(width, height, description=""):
     }
     
     try:
-        print(f"⏳ Starting generation...")
-        start_time = time.time()
-        response = requests.post(API_URL, json=payload, timeout=300)
-        elapsed = time.time() - start_time
+        async with sem:
+            print(f"⏳ Starting generation ({width}×{height})...")
+            start_time = time.time()
+            async with session.post(API_URL, json=payload, timeout=aiohttp.ClientTimeout(total=300)) as response:
+                body = await response.text()
+            elapsed = time.time() - start_time
         
-        if response.status_code == 200:
-            print(f"✅ SUCCESS in {elapsed:.1f}s")
+        if response.status == 200:
+            print(f"✅ SUCCESS {width}×{height} in {elapsed:.1f}s")
             return {"width": width, "height": height, "pixels": pixels, 
                     "status": "success", "time": elapsed}
         else:
-            print(f"❌ FAILED: HTTP {response.status_code}")
-            print(f"   Error: {response.text[:200]}")
+            print(f"❌ FAILED {width}×{height}: HTTP {response.status}")
+            print(f"   Error: {body[:200]}")
             return {"width": width, "height": height, "pixels": pixels, 
-                    "status": "http_error", "code": response.status_code}
-    except requests.exceptions.Timeout:
-        print(f"⏱️  TIMEOUT after 300s")
+                    "status": "http_error", "code": response.status}
+    except asyncio.TimeoutError:
+        print(f"⏱️  TIMEOUT after 300s ({width}×{height})")
         return {"width": width, "height": height, "pixels": pixels, "status": "timeout"}
-    except requests.exceptions.ConnectionError as e:
-        print(f"💥 CONNECTION ERROR - Container likely crashed")
+    except aiohttp.ClientConnectionError as e:
+        print(f"💥 CONNECTION ERROR at {width}×{height} - Container likely crashed")
         print(f"   Error details: {e}")
         print("\n⚠️  STOPPING TEST - Please check container logs with:")
         print("   docker logs minimal-sd-api")
@@ -61,10 +67,42 @@ def test_resolution(width, height, description=""):
         return {"width": width, "height": height, "pixels": pixels, 
                 "status": "error", "error": str(e)}
 
-def main():
+async def run_probes(session, sem, tests):
+    """
+    Run independent probes concurrently.
+    
+    Outstanding probes are cancelled as soon as one of them crashes the
+    server, so the "stop on first crash" behaviour is preserved.
+    """
+    tasks = [asyncio.create_task(test_resolution(session, sem, w, h, desc)) for w, h, desc in tests]
+    results = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            results.append(result)
+            if result["status"] == "crash":
+                break
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+async def main():
     """Run boundary tests"""
     results = []
     
+    # Keep-alive connector so probes reuse the same TCP connection(s)
+    connector = aiohttp.TCPConnector(limit=4, force_close=False, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        sem = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+        await run_phases(session, sem, results)
+    
+    save_and_summarize(results)
+
+async def run_phases(session, sem, results):
+    """Phases 1-3 of the boundary investigation; appends to results"""
     print("🔍 CRASH BOUNDARY INVESTIGATION")
     print("=" * 60)
     print("Known safe:  832×832  = 692,224 pixels ✅ (stable)")
@@ -94,16 +132,15 @@ def main():
         # (896, 768, "Taller - 896 × safe"),  # UNCOMMENT to push further
     ]
     
-    for width, height, desc in tests_phase1:
-        result = test_resolution(width, height, desc)
-        results.append(result)
-        
-        # Stop immediately on crash for verification
+    results.extend(await run_probes(session, sem, tests_phase1))
+    
+    # Stop immediately on crash for verification
+    for result in results:
         if result["status"] == "crash":
             print("\n" + "="*60)
             print("🛑 CRASH DETECTED - STOPPING FOR VERIFICATION")
             print("="*60)
-            print(f"Failed at: {width}×{height} = {result['pixels']:,} pixels")
+            print(f"Failed at: {result['width']}×{result['height']} = {result['pixels']:,} pixels")
             print("\n📋 Next steps:")
             print("1. Check container logs: docker logs minimal-sd-api")
             print("2. Verify error type (munmap_chunk, malloc, etc.)")
@@ -125,21 +162,25 @@ def main():
         safe_size = 832
         unstable_size = 864
         
-        # Test a few sizes to find consistent boundary
-        test_sizes = [840, 848, 856]
-        
-        for size in test_sizes:
-            if size > safe_size and size < unstable_size:
-                result = test_resolution(size, size, f"Testing {size}×{size} for stability")
-                results.append(result)
-                
-                if result["status"] == "success":
-                    print(f"✅ {size}×{size} works")
-                    safe_size = size
-                elif result["status"] == "crash":
-                    print(f"❌ {size}×{size} crashes - stopping")
-                    unstable_size = size
-                    break
+        while unstable_size - safe_size > 8:
+            # Keep probes on multiples of 8 (SD's latent grid)
+            size = ((safe_size + unstable_size) // 2) & ~7
+            if size in (safe_size, unstable_size):
+                break
+            
+            result = await test_resolution(session, sem, size, size, f"Bisecting {size}×{size} for stability")
+            results.append(result)
+            
+            if result["status"] == "success":
+                print(f"✅ {size}×{size} works")
+                safe_size = size
+            elif result["status"] == "crash":
+                print(f"❌ {size}×{size} crashes - stopping")
+                unstable_size = size
+                break
+            else:
+                print(f"⚠️  {size}×{size} failed ({result['status']}) - treating as unstable")
+                unstable_size = size
         
         print(f"\n🎯 STABLE SQUARE LIMIT: {safe_size}×{safe_size} = {safe_size * safe_size:,} pixels")
         
@@ -161,14 +202,16 @@ def main():
                     (896, 768, "Can we exceed square limit in other dimension?"),
                 ])
             
-            for width, height, desc in tests_phase3:
-                if (width, height) not in [(r["width"], r["height"]) for r in results]:
-                    result = test_resolution(width, height, desc)
-                    results.append(result)
-                    if result["status"] == "crash":
-                        print("\n🛑 Crash in rectangle testing - stopping")
-                        break
-    
+            tested = {(r["width"], r["height"]) for r in results}
+            phase3_results = await run_probes(
+                session, sem, [t for t in tests_phase3 if (t[0], t[1]) not in tested]
+            )
+            results.extend(phase3_results)
+            if any(r["status"] == "crash" for r in phase3_results):
+                print("\n🛑 Crash in rectangle testing - stopping")
+
+def save_and_summarize(results):
+    """Save results to JSON and print the analysis"""
     # Save results
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"crash_boundary_analysis_{timestamp}.json"
@@ -226,4 +269,4 @@ def main():
             print("   → Crash threshold is approximately the same regardless of aspect ratio")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -6,20 +6,74 @@ A lightweight FastAPI server for generating images with Stable Diffusion
 
 import os
 import io
+import gc
+import json
 import base64
-from typing import Optional
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal, Optional
+
+# Set SD_DEBUG=1 to serialize kernel launches while debugging GPU crashes
+DEBUG = os.environ.get("SD_DEBUG", "0") == "1"
+
+# Set comprehensive ROCm/HIPBLAS environment variables. These must be set
+# BEFORE importing torch - the HIP caching allocator reads its config once
+# at initialization.
+os.environ['HIP_VISIBLE_DEVICES'] = '0'
+os.environ['HSA_FORCE_FINE_GRAIN_PCIE'] = '1'
+os.environ['PYTORCH_HIP_ALLOC_CONF'] = 'expandable_segments:True,garbage_collection_threshold:0.8'  # Reclaim VRAM between generations instead of fragmenting
+os.environ['ROCBLAS_LAYER'] = '0'  # Disable rocBLAS logging
+os.environ['HIP_FORCE_DEV_KERNARG'] = '1'  # Force device kernel arguments
+os.environ['TORCH_USE_HIP_DSA'] = '1'  # Enable device-side assertions
+os.environ['HSA_ENABLE_SDMA'] = '0'  # Disable SDMA which can cause issues
+if DEBUG:
+    # Both serialize every kernel launch - debugging only, they kill throughput
+    os.environ['AMD_SERIALIZE_KERNEL'] = '1'
+    os.environ['HIP_LAUNCH_BLOCKING'] = '1'
+else:
+    os.environ.pop('AMD_SERIALIZE_KERNEL', None)
+    os.environ.pop('HIP_LAUNCH_BLOCKING', None)
+
 import torch
 from PIL import Image
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationInfo, field_validator
 import uvicorn
 
 # Check if we're running in a container
 IN_CONTAINER = os.path.exists('/.dockerenv')
 
+# INT8 weight-only UNet (optimum-quanto). Quantized once, then cached on disk
+# so later boots skip loading the FP16 UNet entirely. Set SD_UNET_INT8=0 to
+# run the plain FP16 UNet.
+USE_INT8_UNET = os.environ.get("SD_UNET_INT8", "1") == "1"
+QUANTIZED_UNET_DIR = Path("/workspace/Models/sd14-int8" if IN_CONTAINER else "./models/sd14-int8")
+
+# torch.compile the UNet (Inductor fuses conv/norm/activation kernels).
+# Compiled with dynamic shapes: requests mix resolutions and batch sizes, and
+# a static compile would recompile on the GPU thread for every new shape.
+# Set SD_TORCH_COMPILE=0 to run eager.
+USE_TORCH_COMPILE = os.environ.get("SD_TORCH_COMPILE", "1") == "1"
+
+# Replay the UNet (compiled or eager) from captured CUDA graphs at the
+# common resolutions. Set SD_CUDA_GRAPHS=0 to disable.
+USE_CUDA_GRAPHS = os.environ.get("SD_CUDA_GRAPHS", "1") == "1"
+CUDA_GRAPH_RESOLUTIONS = {(512, 512), (768, 768)}
+CUDA_GRAPH_MAX = 8
+
+# Keep the CLIP text encoder on the CPU in FP32. With the embedding cache it
+# only runs for new prompts, and it frees ~250MB of VRAM. Set
+# SD_TEXT_ENCODER_CPU=0 to keep it on the GPU.
+TEXT_ENCODER_ON_CPU = os.environ.get("SD_TEXT_ENCODER_CPU", "1") == "1"
+
 # Try to import diffusers
 try:
-    from diffusers import StableDiffusionPipeline
+    from diffusers import DPMSolverMultistepScheduler, StableDiffusionPipeline
+    from diffusers.models.attention_processor import AttnProcessor2_0
+    from transformers import CLIPTokenizerFast
     print("✅ Diffusers imported successfully")
 except ImportError as e:
     print(f"❌ Failed to import diffusers: {e}")
@@ -35,6 +89,47 @@ app = FastAPI(
 # Global pipeline variable
 pipeline = None
 
+# Uncompiled UNet, kept so we can fall back if torch.compile fails
+eager_unet = None
+
+# CLIP text encoder used by encode_tokens. When it runs on the CPU it is
+# detached from the pipeline (pipeline.text_encoder = None), so diffusers
+# takes its working dtype from the FP16 UNet instead of the FP32 encoder.
+text_encoder = None
+
+# Attention slicing only pays off for large images; below this pixel count
+# the fused attention kernel is faster and fits comfortably in 12GB
+ATTENTION_SLICING_THRESHOLD = 640 * 640
+attention_sliced = False
+
+# Set after an out-of-memory failure so the next request cleans up first
+recover_memory = False
+
+# All GPU work runs on this single thread, fed by one queue worker, so
+# concurrent requests never launch UNet kernels at the same time
+gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sd-gpu")
+generation_queue = None
+generation_worker_task = None
+
+# Queued requests with the same (width, height, steps, guidance) share one
+# UNet forward. The pixel budget keeps batches at 512×512 and below, so
+# 768×768 always runs alone.
+BATCH_MAX_SIZE = 4
+BATCH_MAX_PIXELS = 4 * 512 * 512
+
+# LRU cache of CLIP token ids (CPU tensors) keyed by prompt text. Filled from
+# the request handler's worker thread, so BPE tokenization overlaps with the
+# GPU thread instead of running in front of the text encoder.
+TOKEN_CACHE_SIZE = 256
+token_cache = OrderedDict()
+token_cache_lock = threading.Lock()
+
+# LRU cache of CLIP text-encoder outputs, so repeated prompts/negative prompts
+# skip the text-encoder forward:
+# (prompt, negative_prompt, do_cfg) -> (prompt_embeds, negative_prompt_embeds)
+EMBED_CACHE_SIZE = 64
+embed_cache = OrderedDict()
+
 # Resolution limits based on testing with RX 6700 XT + ROCm 6.4
 # Testing revealed asymmetric behavior and multiple crash types
 # Conservative limits chosen for stability
@@ -42,62 +137,319 @@ MAX_WIDTH = 768
 MAX_HEIGHT = 768  # Could push to 832 for width, but keeping symmetric for safety
 MIN_DIMENSION = 64
 
+# DPM++ 2M Karras converges in far fewer steps than the default PNDM scheduler
+SCHEDULER_NAME = "DPM++ 2M Karras"
+DEFAULT_STEPS = 15
+
 class GenerateRequest(BaseModel):
     prompt: str
     negative_prompt: Optional[str] = ""
-    width: Optional[int] = 512
-    height: Optional[int] = 512
-    num_inference_steps: Optional[int] = 20
-    guidance_scale: Optional[float] = 7.5
+    width: int = 512
+    height: int = 512
+    num_inference_steps: int = DEFAULT_STEPS
+    guidance_scale: float = 7.5
     seed: Optional[int] = None
+    output_format: Literal["webp", "png", "jpeg"] = "webp"
+    
+    @field_validator("width", "height")
+    @classmethod
+    def check_dimension(cls, value: int, info: ValidationInfo) -> int:
+        """
+        Validate image resolution to prevent crashes. Runs at parse time, so
+        bad requests get a 422 before reaching the handler or the GPU queue.
+        
+        Based on testing with RX 6700 XT (12GB) + ROCm 6.4:
+        - 768×768 is reliably stable
+        - 768×832 works but 832×768 crashes (asymmetric!)
+        - 864×864+ is unstable/crashes
+        """
+        name = info.field_name.capitalize()
+        limit = MAX_WIDTH if info.field_name == "width" else MAX_HEIGHT
+        
+        # Must be divisible by 8 (SD requirement)
+        if value % 8 != 0:
+            raise ValueError(f"{name} must be divisible by 8 (got {value})")
+        
+        if value < MIN_DIMENSION:
+            raise ValueError(f"{name} must be at least {MIN_DIMENSION} (got {value})")
+        
+        # Conservative maximum for stability
+        if value > limit:
+            raise ValueError(
+                f"{name} must not exceed {limit} (got {value}). "
+                f"Maximum tested stable resolution is {MAX_WIDTH}×{MAX_HEIGHT}"
+            )
+        
+        return value
 
 class GenerateResponse(BaseModel):
     image_base64: str
     seed: int
     prompt: str
+    format: str = "webp"
+
+# Encoder settings per output format. WebP encodes ~5-10× faster than PNG's
+# zlib at similar visual quality. SD output compresses poorly, so zlib level 1
+# is ~3× faster than the default level 6 for <5% larger PNGs.
+IMAGE_SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "quality": 92, "method": 4},
+    "png": {"format": "PNG", "compress_level": 1},
+    "jpeg": {"format": "JPEG", "quality": 92},
+}
+
+# One reusable encode buffer per encoding thread
+_encode_buffers = threading.local()
+
+def _get_encode_buffer() -> io.BytesIO:
+    """Return this thread's encode buffer, emptied and rewound"""
+    buffer = getattr(_encode_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _encode_buffers.buffer = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate()
+    return buffer
+
+def encode_image(image, output_format: str) -> str:
+    """Encode a PIL image and return it as base64 (blocking - run off the event loop)"""
+    buffer = _get_encode_buffer()
+    image.save(buffer, **IMAGE_SAVE_OPTIONS[output_format])
+    with buffer.getbuffer() as view:
+        return base64.b64encode(view).decode('utf-8')
 
-def validate_resolution(width: int, height: int) -> tuple[bool, str]:
+def tensors_to_images(images: torch.Tensor) -> list:
     """
-    Validate image resolution to prevent crashes.
+    Convert the pipeline's output_type="pt" batch (B, 3, H, W in [0, 1]) to
+    PIL images. Quantizes to uint8 on the GPU so only H*W*3 bytes per image
+    cross to the host, instead of diffusers' float32 CPU round-trip.
+    """
+    arrays = (
+        images.clamp(0, 1).mul_(255).round_()
+        .to(torch.uint8).permute(0, 2, 3, 1).contiguous()
+        .cpu().numpy()
+    )
+    return [Image.fromarray(array) for array in arrays]
+
+def load_quantized_unet(model_id: str, cache_dir: str, device: str, dtype: torch.dtype):
+    """
+    Load the cached INT8 UNet, if one has been saved.
     
-    Based on testing with RX 6700 XT (12GB) + ROCm 6.4:
-    - 768×768 is reliably stable
-    - 768×832 works but 832×768 crashes (asymmetric!)
-    - 864×864+ is unstable/crashes
+    The module is built on the meta device and requantized straight onto
+    the GPU, so no FP16 UNet weights are read or moved. It is cast to dtype
+    first: requantize allocates the non-quantized tensors (biases, norms)
+    like the module's own, so they would otherwise stay FP32.
     
-    Args:
-        width: Image width in pixels
-        height: Image height in pixels
-        
     Returns:
-        (is_valid, error_message)
+        The quantized UNet, or None if no cache exists
     """
-    # Must be divisible by 8 (SD requirement)
-    if width % 8 != 0:
-        return False, f"Width must be divisible by 8 (got {width})"
+    weights_path = QUANTIZED_UNET_DIR / "unet.safetensors"
+    qmap_path = QUANTIZED_UNET_DIR / "quantization_map.json"
+    if not (weights_path.exists() and qmap_path.exists()):
+        return None
     
-    if height % 8 != 0:
-        return False, f"Height must be divisible by 8 (got {height})"
+    from diffusers import UNet2DConditionModel
+    from optimum.quanto import requantize
+    from safetensors.torch import load_file
     
-    # Check minimum
-    if width < MIN_DIMENSION:
-        return False, f"Width must be at least {MIN_DIMENSION} (got {width})"
+    config = UNet2DConditionModel.load_config(model_id, subfolder="unet", cache_dir=cache_dir)
+    with torch.device("meta"):
+        unet = UNet2DConditionModel.from_config(config).to(dtype)
+    requantize(unet, load_file(weights_path), json.loads(qmap_path.read_text()), device=torch.device(device))
+    return unet
+
+def quantize_unet(unet):
+    """Quantize UNet weights to INT8 in place and cache the result on disk"""
+    from optimum.quanto import freeze, qint8, quantization_map, quantize
+    from safetensors.torch import save_file
+    
+    quantize(unet, weights=qint8)
+    freeze(unet)
+    
+    QUANTIZED_UNET_DIR.mkdir(parents=True, exist_ok=True)
+    save_file(unet.state_dict(), QUANTIZED_UNET_DIR / "unet.safetensors")
+    (QUANTIZED_UNET_DIR / "quantization_map.json").write_text(json.dumps(quantization_map(unet)))
+
+def select_vae_dtype():
+    """
+    Pick the VAE precision for this GPU.
     
-    if height < MIN_DIMENSION:
-        return False, f"Height must be at least {MIN_DIMENSION} (got {height})"
+    The FP16 VAE decode is what triggers driver timeouts/crashes on ROCm.
+    RDNA3+ (gfx11, major >= 11) has native BF16; RDNA2 (gfx103x, e.g. the
+    RX 6700 XT) only emulates it, so fall back to FP32 there.
+    """
+    major = torch.cuda.get_device_properties(0).major
+    return torch.bfloat16 if major >= 11 else torch.float32
+
+def cast_vae(pipeline, vae_dtype):
+    """Run the VAE in vae_dtype while the UNet keeps producing FP16 latents"""
+    pipeline.vae = pipeline.vae.to(dtype=vae_dtype)
     
-    # Check maximum (conservative for stability)
-    if width > MAX_WIDTH:
-        return False, f"Width must not exceed {MAX_WIDTH} (got {width}). Maximum tested stable resolution is {MAX_WIDTH}×{MAX_HEIGHT}"
+    # StableDiffusionPipeline hands FP16 latents straight to vae.decode, so
+    # cast them to the VAE's dtype on the way in
+    original_decode = pipeline.vae.decode
     
-    if height > MAX_HEIGHT:
-        return False, f"Height must not exceed {MAX_HEIGHT} (got {height}). Maximum tested stable resolution is {MAX_WIDTH}×{MAX_HEIGHT}"
+    def decode(z, *args, **kwargs):
+        return original_decode(z.to(vae_dtype), *args, **kwargs)
     
-    return True, "OK"
+    pipeline.vae.decode = decode
+
+class GraphedUNet(torch.nn.Module):
+    """
+    Wraps the UNet and replays one CUDA graph per input shape for the
+    resolutions in CUDA_GRAPH_RESOLUTIONS, removing per-kernel launch
+    overhead from every denoise step. Each denoise step copies its inputs
+    into the static tensors and replays the graph. Other shapes, extra
+    conditioning kwargs and failed captures run eager. All graphs share
+    one memory pool, which is safe because there is a single GPU thread.
+    """
+    
+    def __init__(self, unet):
+        super().__init__()
+        self.unet = unet
+        self.graphs = {}  # shape key -> (graph, static inputs, static output) or None
+        self.pool = torch.cuda.graph_pool_handle()
+    
+    def __getattr__(self, name):
+        # Let the pipeline keep reading config/dtype/device and calling the
+        # attention-processor setters on the real UNet
+        try:
+            return super().__getattr__(name)
+        except AttributeError:
+            return getattr(self.unet, name)
+    
+    def eligible(self, sample, kwargs) -> bool:
+        height, width = sample.shape[-2] * 8, sample.shape[-1] * 8
+        if (width, height) not in CUDA_GRAPH_RESOLUTIONS:
+            return False
+        if kwargs.get("return_dict", True):
+            return False
+        return not any(
+            kwargs.get(name) for name in ("timestep_cond", "cross_attention_kwargs", "added_cond_kwargs")
+        )
+    
+    def capture(self, sample, timestep, encoder_hidden_states):
+        static_sample = sample.clone()
+        static_timestep = torch.as_tensor(timestep, device=sample.device).clone()
+        static_hidden = encoder_hidden_states.clone()
+        
+        def run():
+            return self.unet(
+                static_sample, static_timestep,
+                encoder_hidden_states=static_hidden, return_dict=False
+            )[0]
+        
+        # Warm up on a side stream (required before capture), then capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(2):
+                run()
+        torch.cuda.current_stream().wait_stream(stream)
+        
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, pool=self.pool):
+            static_out = run()
+        return graph, (static_sample, static_timestep, static_hidden), static_out
+    
+    def forward(self, sample, timestep, encoder_hidden_states, **kwargs):
+        if not self.eligible(sample, kwargs):
+            return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states, **kwargs)
+        
+        key = (tuple(sample.shape), tuple(encoder_hidden_states.shape), sample.dtype)
+        if key not in self.graphs:
+            if len(self.graphs) >= CUDA_GRAPH_MAX:
+                return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states, **kwargs)
+            try:
+                self.graphs[key] = self.capture(sample, timestep, encoder_hidden_states)
+                print(f"✅ Captured UNet CUDA graph for {key[0]}")
+            except Exception as e:
+                print(f"⚠️  CUDA graph capture failed for {key[0]}, running eager: {e}")
+                self.graphs[key] = None
+        
+        entry = self.graphs[key]
+        if entry is None:
+            return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states, **kwargs)
+        
+        graph, (static_sample, static_timestep, static_hidden), static_out = entry
+        static_sample.copy_(sample)
+        static_timestep.copy_(torch.as_tensor(timestep))
+        static_hidden.copy_(encoder_hidden_states)
+        graph.replay()
+        # The next replay overwrites static_out, so hand back a copy
+        return (static_out.clone(),)
+
+def configure_attention_slicing(width: int, height: int):
+    """Enable "auto" attention slicing for large images, fused attention otherwise"""
+    global attention_sliced
+    
+    want_slicing = width * height > ATTENTION_SLICING_THRESHOLD
+    if want_slicing == attention_sliced:
+        return
+    
+    if want_slicing:
+        pipeline.enable_attention_slicing("auto")
+    else:
+        pipeline.unet.set_attn_processor(AttnProcessor2_0())
+    attention_sliced = want_slicing
+
+def tokenize_prompt(text: str) -> torch.Tensor:
+    """Return padded CLIP input ids for text (CPU tensor), tokenizing only on a cache miss"""
+    # The lock also covers the tokenizer call: Rust tokenizers are not safe
+    # to call from several threads at once
+    with token_cache_lock:
+        input_ids = token_cache.get(text)
+        if input_ids is not None:
+            token_cache.move_to_end(text)
+            return input_ids
+        
+        tokenizer = pipeline.tokenizer
+        input_ids = tokenizer(
+            text,
+            padding="max_length",
+            max_length=tokenizer.model_max_length,
+            truncation=True,
+            return_tensors="pt",
+        ).input_ids
+        token_cache[text] = input_ids
+        while len(token_cache) > TOKEN_CACHE_SIZE:
+            token_cache.popitem(last=False)
+        return input_ids
+
+def pretokenize_request(request: GenerateRequest):
+    """Warm the token cache for a request (blocking - run off the event loop)"""
+    tokenize_prompt(request.prompt)
+    if request.guidance_scale > 1.0:
+        tokenize_prompt(request.negative_prompt or "")
+
+def encode_tokens(input_ids: torch.Tensor) -> torch.Tensor:
+    """Run the CLIP text encoder on cached token ids; returns FP16 embeddings on the GPU"""
+    embeds = text_encoder(input_ids.to(text_encoder.device))[0]
+    return embeds.to(device="cuda", dtype=torch.float16)
+
+def get_prompt_embeds(prompt: str, negative_prompt: str, do_classifier_free_guidance: bool):
+    """Return (prompt_embeds, negative_prompt_embeds), encoding only on a cache miss"""
+    key = (prompt, negative_prompt, do_classifier_free_guidance)
+    
+    cached = embed_cache.get(key)
+    if cached is not None:
+        embed_cache.move_to_end(key)
+        return cached
+    
+    # Same result as pipeline.encode_prompt for SD 1.x (no clip_skip, no
+    # attention mask), but reuses already-tokenized prompts
+    prompt_embeds = encode_tokens(tokenize_prompt(prompt))
+    negative_prompt_embeds = None
+    if do_classifier_free_guidance:
+        negative_prompt_embeds = encode_tokens(tokenize_prompt(negative_prompt))
+    
+    embeds = (prompt_embeds, negative_prompt_embeds)
+    embed_cache[key] = embeds
+    while len(embed_cache) > EMBED_CACHE_SIZE:
+        embed_cache.popitem(last=False)
+    return embeds
 
 def initialize_pipeline():
     """Initialize the Stable Diffusion pipeline"""
-    global pipeline
+    global pipeline, eager_unet, text_encoder
     
     print("🚀 Initializing Stable Diffusion pipeline...")
     
@@ -118,25 +470,16 @@ def initialize_pipeline():
         
         print(f"📥 Loading model: {model_id}")
         
-        # Set comprehensive ROCm/HIPBLAS environment variables
-        os.environ['AMD_SERIALIZE_KERNEL'] = '1'  # Enable kernel serialization
-        os.environ['HIP_VISIBLE_DEVICES'] = '0'
-        os.environ['HSA_FORCE_FINE_GRAIN_PCIE'] = '1'
-        os.environ['PYTORCH_HIP_ALLOC_CONF'] = 'max_split_size_mb:128'  # Manageable chunks without expandable_segments
-        os.environ['HIP_LAUNCH_BLOCKING'] = '1'
-        os.environ['ROCBLAS_LAYER'] = '0'  # Disable rocBLAS logging
-        os.environ['HIP_FORCE_DEV_KERNARG'] = '1'  # Force device kernel arguments
-        os.environ['TORCH_USE_HIP_DSA'] = '1'  # Enable device-side assertions
-        os.environ['HSA_ENABLE_SDMA'] = '0'  # Disable SDMA which can cause issues
-        
         # Set PyTorch-specific ROCm optimizations
         torch.backends.cuda.matmul.allow_tf32 = False
         torch.backends.cudnn.allow_tf32 = False
         
-        # Try to avoid HIPBLAS by using alternative implementations
-        torch.backends.cuda.enable_flash_sdp(False)  # Disable flash attention
-        torch.backends.cuda.enable_mem_efficient_sdp(False)  # Disable memory efficient attention
-        torch.backends.cuda.enable_math_sdp(True)  # Use basic math implementation
+        # Prefer fused SDP attention kernels. The math backend stays enabled
+        # only as a fallback for shapes/dtypes the fused kernels don't cover
+        # on this GPU (SDPA picks the fastest available backend per call)
+        torch.backends.cuda.enable_mem_efficient_sdp(True)
+        torch.backends.cuda.enable_flash_sdp(True)
+        torch.backends.cuda.enable_math_sdp(True)
         
         # Try a minimal tensor operation first to test HIP runtime
         print("🔧 Testing basic HIP functionality...")
@@ -154,24 +497,70 @@ def initialize_pipeline():
         # Use PYTORCH_HIP_ALLOC_CONF environment variable instead for memory management
         print("✅ Using PYTORCH_HIP_ALLOC_CONF for memory management instead of memory fraction")
 
+        cache_dir = "/workspace/Models" if IN_CONTAINER else "./models"
+        
+        # Reuse the cached INT8 UNet when available
+        quantized_unet = None
+        if USE_INT8_UNET:
+            try:
+                quantized_unet = load_quantized_unet(model_id, cache_dir, device, torch_dtype)
+                if quantized_unet is not None:
+                    print(f"✅ Loaded cached INT8 UNet from {QUANTIZED_UNET_DIR}")
+            except Exception as e:
+                print(f"⚠️  Could not load cached INT8 UNet, rebuilding: {e}")
+        
         # Load pipeline to CPU first to avoid GPU memory fragmentation
         print("📦 Loading pipeline to CPU first...")
         try:
+            extra_components = {"unet": quantized_unet} if quantized_unet is not None else {}
             pipeline = StableDiffusionPipeline.from_pretrained(
                 model_id,
                 torch_dtype=torch_dtype,
                 use_safetensors=True,
-                cache_dir="/workspace/Models" if IN_CONTAINER else "./models",
+                cache_dir=cache_dir,
                 # ROCm-specific settings
                 variant="fp16" if torch_dtype == torch.float16 else None,
                 low_cpu_mem_usage=True,  # Reduce CPU memory during loading
-                device_map=None  # Load to CPU first
+                device_map=None,  # Load to CPU first
+                **extra_components
             )
             print("✅ Pipeline loaded to CPU successfully")
         except Exception as e:
             print(f"❌ Pipeline loading to CPU failed: {e}")
             return False
         
+        # DPM-Solver++ (2M) with Karras sigmas matches PNDM quality in about
+        # half the steps - each UNet step is the dominant cost
+        pipeline.scheduler = DPMSolverMultistepScheduler.from_config(
+            pipeline.scheduler.config,
+            algorithm_type="dpmsolver++",
+            use_karras_sigmas=True
+        )
+        print(f"✅ Scheduler: {SCHEDULER_NAME}")
+        
+        # Swap the pure-Python CLIP BPE tokenizer for the Rust one
+        try:
+            pipeline.tokenizer = CLIPTokenizerFast.from_pretrained(
+                model_id, subfolder="tokenizer", cache_dir=cache_dir
+            )
+            print("✅ Using fast (Rust) CLIP tokenizer")
+        except Exception as e:
+            print(f"⚠️  Fast tokenizer unavailable, keeping default: {e}")
+        
+        # First run: quantize the FP16 UNet and cache it for the next boot
+        if USE_INT8_UNET and quantized_unet is None:
+            try:
+                print("🔧 Quantizing UNet weights to INT8 (first run only)...")
+                quantize_unet(pipeline.unet)
+                print(f"✅ INT8 UNet cached to {QUANTIZED_UNET_DIR}")
+            except Exception as e:
+                print(f"⚠️  UNet quantization failed, keeping FP16 UNet: {e}")
+        
+        # Keep the UNet in FP16 but move the VAE off FP16 to avoid decode crashes
+        vae_dtype = select_vae_dtype()
+        cast_vae(pipeline, vae_dtype)
+        print(f"✅ VAE running in {str(vae_dtype).replace('torch.', '')} (UNet stays {str(torch_dtype).replace('torch.', '')})")
+        
         # Clear GPU memory before loading
         print("🧹 Clearing GPU memory...")
         torch.cuda.empty_cache()
@@ -189,55 +578,37 @@ def initialize_pipeline():
             print(f"⚠️  HIPBLAS pre-init warning: {e}")
             # Continue anyway - sometimes this works after pipeline load
         
-        # Move components to device one by one to manage memory better
-        print("🚚 Moving pipeline components to GPU...")
-        
-        # Move VAE first (usually the most memory-intensive)
-        try:
-            print("🔄 Moving VAE to GPU...")
-            pipeline.vae = pipeline.vae.to(device)
-            torch.cuda.empty_cache()
-            print("✅ VAE moved to GPU successfully")
-        except Exception as e:
-            print(f"❌ Failed to move VAE to GPU: {e}")
-            print("❌ VAE movement failed - cannot continue without GPU")
-            return False
-            
-        # Move text encoder
-        try:
-            print("🔄 Moving text encoder to GPU...")
-            pipeline.text_encoder = pipeline.text_encoder.to(device)
-            torch.cuda.empty_cache()
-            print("✅ Text encoder moved to GPU successfully")
-        except Exception as e:
-            print(f"❌ Failed to move text encoder to GPU: {e}")
-            print("❌ Text encoder movement failed - cannot continue without GPU")
-            return False
-            
-        # Move UNet (most compute-intensive)
+        # The whole pipeline fits comfortably in 12GB, so move it in one go
+        print("🚚 Moving pipeline to GPU...")
         try:
-            print("🔄 Moving UNet to GPU...")
-            pipeline.unet = pipeline.unet.to(device)
+            pipeline.to(device)
+            text_encoder = pipeline.text_encoder
+            if TEXT_ENCODER_ON_CPU:
+                # encode_prompt casts given embeddings to text_encoder.dtype
+                # and prepare_latents follows them, so an attached FP32
+                # encoder would feed FP32 latents to the FP16 UNet
+                text_encoder.to("cpu", dtype=torch.float32)
+                pipeline.text_encoder = None
             torch.cuda.empty_cache()
-            print("✅ UNet moved to GPU successfully")
+            print("✅ Pipeline moved to GPU successfully")
+            if TEXT_ENCODER_ON_CPU:
+                print("✅ CLIP text encoder kept on CPU (FP32)")
         except Exception as e:
-            print(f"❌ Failed to move UNet to GPU: {e}")
-            print("❌ UNet movement failed - cannot continue without GPU")
+            print(f"❌ Failed to move pipeline to GPU: {e}")
+            print("❌ Pipeline movement failed - cannot continue without GPU")
             return False
-            
-        # Move tokenizer and scheduler (these are lightweight and should stay on CPU anyway)
-        print("✅ All critical components moved to GPU successfully")
         
         # ========================================
         # PHASE 1 MEMORY OPTIMIZATIONS (Easy Wins)
         # ========================================
         
-        # 1. Enable attention slicing (20-30% memory reduction)
+        # 1. Fused scaled-dot-product attention for the UNet. This replaces
+        #    attention slicing, whose sliced processor would override it
         try:
-            pipeline.enable_attention_slicing(1)  # Maximum slicing
-            print("✅ [PHASE 1] Maximum attention slicing enabled (20-30% memory reduction)")
-        except:
-            print("⚠️  Attention slicing not available")
+            pipeline.unet.set_attn_processor(AttnProcessor2_0())
+            print("✅ [PHASE 1] Fused SDP attention enabled (AttnProcessor2_0)")
+        except Exception as e:
+            print(f"⚠️  Fused SDP attention not available: {e}")
         
         # 2. Enable VAE tiling (handles 1024×1024+ images)
         try:
@@ -258,17 +629,38 @@ def initialize_pipeline():
             print("✅ [PHASE 1] Channels-last memory format enabled (5-10% optimization)")
         except Exception as e:
             print(f"⚠️  Channels-last format not available: {e}")
-            
-        # 4. Model CPU offload for large model support
-        try:
-            pipeline.enable_model_cpu_offload()
-            print("✅ [PHASE 1] Model CPU offload enabled (enables large models)")  
-        except Exception as e:
-            print(f"⚠️  Model CPU offload not available: {e}")
-            print("🎮 Keeping pipeline fully on GPU (no CPU offload)")
+        
+        # No model CPU offload: SD 1.4 fits easily in 12GB, and offloading
+        # would move every submodule across PCIe on each denoise step
+        print("🎮 Keeping pipeline fully on GPU (no CPU offload)")
         
         print("🎮 Phase 1 optimizations complete - Testing 768×768+ should now work!")
         
+        # Compile the UNet. Compilation itself is lazy - warmup_pipeline()
+        # triggers it at startup and falls back to eager if it fails
+        if USE_TORCH_COMPILE:
+            try:
+                eager_unet = pipeline.unet
+                pipeline.unet = torch.compile(pipeline.unet, dynamic=True)
+                print("✅ UNet wrapped with torch.compile (dynamic shapes)")
+            except Exception as e:
+                print(f"⚠️  torch.compile not available: {e}")
+        
+        # Pay HIPBLAS workspace allocation, MIOpen autotune and compile cost
+        # now rather than on the first user request
+        warmup_pipeline()
+        
+        # Graph whichever UNet survived warm-up; shapes that fail to capture
+        # keep running it directly
+        if USE_CUDA_GRAPHS:
+            pipeline.unet = GraphedUNet(pipeline.unet)
+            print("✅ UNet CUDA graphs enabled for " + ", ".join(
+                f"{w}×{h}" for w, h in sorted(CUDA_GRAPH_RESOLUTIONS)
+            ))
+        
+        # Peak memory stats measure serving from here on
+        torch.cuda.reset_peak_memory_stats()
+        
         print("✅ Pipeline initialized successfully!")
         return True
         
@@ -276,12 +668,61 @@ def initialize_pipeline():
         print(f"❌ Failed to initialize pipeline: {e}")
         return False
 
+def warmup_pipeline():
+    """
+    Run one dummy 512×512 generation so the first user request doesn't pay
+    torch.compile / kernel autotune cost. The UNet is compiled with dynamic
+    batch and spatial sizes, so this one compile also covers the other
+    resolutions and batch sizes (guidance_scale <= 1 adds one more: a UNet
+    batch of 1 is specialized). If the compiled UNet fails, revert to the
+    eager UNet. Never fails startup.
+    
+    MIOpen's tuning results land in MIOPEN_USER_DB_PATH, which
+    docker-compose.yml points at the persistent data volume, so restarts
+    skip the autotune.
+    """
+    print("🔥 Warming up pipeline (512×512)...")
+    try:
+        with torch.inference_mode():
+            # Go through get_prompt_embeds: the stock encode_prompt assumes
+            # the text encoder lives on the GPU
+            prompt_embeds, negative_prompt_embeds = get_prompt_embeds("warmup", "", True)
+            pipeline(
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
+                width=512,
+                height=512,
+                num_inference_steps=2,
+                output_type="pt",
+            )
+        print("✅ Warm-up complete")
+    except Exception as e:
+        if eager_unet is not None and pipeline.unet is not eager_unet:
+            print(f"⚠️  Compiled UNet failed during warm-up, reverting to eager: {e}")
+            pipeline.unet = eager_unet
+        else:
+            print(f"⚠️  Warm-up failed (continuing): {e}")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the pipeline on startup"""
-    success = initialize_pipeline()
+    global generation_queue, generation_worker_task
+    
+    # Initialize (and warm up) on the GPU thread that will serve requests
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(gpu_executor, initialize_pipeline)
     if not success:
         raise RuntimeError("Failed to initialize Stable Diffusion pipeline")
+    
+    generation_queue = asyncio.Queue()
+    generation_worker_task = asyncio.create_task(generation_worker())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the generation worker"""
+    if generation_worker_task is not None:
+        generation_worker_task.cancel()
+    gpu_executor.shutdown(wait=False)
 
 @app.get("/")
 async def root():
@@ -326,6 +767,13 @@ async def get_limits():
                 "Dimensions must be divisible by 8"
             ]
         },
+        "sampling": {
+            "scheduler": SCHEDULER_NAME,
+            "default_steps": DEFAULT_STEPS,
+            "notes": [
+                "DPM++ 2M Karras gives good results at 10-15 steps"
+            ]
+        },
         "hardware": {
             "gpu": "AMD Radeon RX 6700 XT" if torch.cuda.is_available() else "None",
             "vram": "12GB",
@@ -333,87 +781,156 @@ async def get_limits():
         }
     }
 
+def batch_key(request: GenerateRequest) -> tuple:
+    """Requests with equal keys can share one pipeline call"""
+    return (request.width, request.height, request.num_inference_steps, request.guidance_scale)
+
+def batch_limit(request: GenerateRequest) -> int:
+    """Maximum batch size for this request's resolution"""
+    return max(1, min(BATCH_MAX_SIZE, BATCH_MAX_PIXELS // (request.width * request.height)))
+
+def run_generation(requests: list) -> list:
+    """
+    Run one batched generation on the GPU thread (blocking). All requests
+    must share the same batch_key.
+    
+    Returns:
+        [(PIL image, seed used), ...] in request order
+    """
+    global recover_memory
+    
+    first = requests[0]
+    do_classifier_free_guidance = first.guidance_scale > 1.0
+    
+    # Per-request generators: no global RNG mutation, and each image in a
+    # batch stays reproducible from its own seed
+    seeds = [
+        request.seed if request.seed is not None else torch.randint(0, 2**32, (1,)).item()
+        for request in requests
+    ]
+    generators = [torch.Generator(device="cuda").manual_seed(seed) for seed in seeds]
+    
+    for request, seed in zip(requests, seeds):
+        print(f"🎨 Generating image: '{request.prompt}' (seed: {seed})")
+    print("⚠️  Note: HIPBLAS warnings are expected but non-blocking")
+    
+    # Generate image with comprehensive HIPBLAS error handling
+    with torch.inference_mode():
+        # Only pay for a full cleanup (GC pause, allocator flush, device
+        # barrier) after a previous request ran out of memory
+        if recover_memory:
+            gc.collect()
+            torch.cuda.empty_cache()
+            torch.cuda.synchronize()
+            recover_memory = False
+        
+        # Single attempt with requested parameters - fail clearly if it doesn't work
+        print(f"🎨 Generating {len(requests)}× {first.width}x{first.height} with {first.num_inference_steps} steps")
+        
+        configure_attention_slicing(first.width, first.height)
+        
+        embeds = [
+            get_prompt_embeds(request.prompt, request.negative_prompt or "", do_classifier_free_guidance)
+            for request in requests
+        ]
+        prompt_embeds = torch.cat([embed[0] for embed in embeds])
+        negative_prompt_embeds = (
+            torch.cat([embed[1] for embed in embeds]) if do_classifier_free_guidance else None
+        )
+        
+        result = pipeline(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
+            width=first.width,
+            height=first.height,
+            num_inference_steps=first.num_inference_steps,
+            guidance_scale=first.guidance_scale,
+            generator=generators,
+            output_type="pt",
+        )
+        images = tensors_to_images(result.images)
+    
+    return list(zip(images, seeds))
+
+async def generation_worker():
+    """
+    Pull queued requests and run them on the GPU thread. Everything that
+    queued up during the previous generation is scanned, and the oldest
+    request is batched with compatible ones behind it.
+    """
+    loop = asyncio.get_running_loop()
+    backlog = deque()
+    
+    while True:
+        if not backlog:
+            backlog.append(await generation_queue.get())
+        while not generation_queue.empty():
+            backlog.append(generation_queue.get_nowait())
+        
+        request, future = backlog.popleft()
+        if future.done():
+            continue  # Client went away while queued
+        
+        # Any failure from here on fails only this batch; the worker keeps
+        # serving the queue
+        batch = [(request, future)]
+        try:
+            key = batch_key(request)
+            limit = batch_limit(request)
+            for job in list(backlog):
+                if len(batch) >= limit:
+                    break
+                if job[1].done():
+                    backlog.remove(job)
+                elif batch_key(job[0]) == key:
+                    backlog.remove(job)
+                    batch.append(job)
+            
+            results = await loop.run_in_executor(
+                gpu_executor, run_generation, [job[0] for job in batch]
+            )
+        except Exception as e:
+            for _, job_future in batch:
+                if not job_future.done():
+                    job_future.set_exception(e)
+            continue
+        for (_, job_future), result in zip(batch, results):
+            if not job_future.done():
+                job_future.set_result(result)
+
 @app.post("/generate", response_model=GenerateResponse)
 async def generate_image(request: GenerateRequest):
     """Generate an image from a text prompt"""
-    global pipeline
+    global recover_memory
     
     if pipeline is None:
         raise HTTPException(status_code=503, detail="Pipeline not initialized")
     
-    # Validate resolution before attempting generation
-    is_valid, error_msg = validate_resolution(request.width, request.height)
-    if not is_valid:
-        raise HTTPException(
-            status_code=400, 
-            detail={
-                "error": "Invalid resolution",
-                "message": error_msg,
-                "requested": f"{request.width}×{request.height}",
-                "maximum_safe": f"{MAX_WIDTH}×{MAX_HEIGHT}",
-                "minimum": f"{MIN_DIMENSION}×{MIN_DIMENSION}"
-            }
-        )
-    
     try:
-        # Set seed for reproducibility
-        if request.seed is not None:
-            torch.manual_seed(request.seed)
-            if torch.cuda.is_available():
-                torch.cuda.manual_seed(request.seed)
-            actual_seed = request.seed
-        else:
-            actual_seed = torch.randint(0, 2**32, (1,)).item()
-            torch.manual_seed(actual_seed)
-            if torch.cuda.is_available():
-                torch.cuda.manual_seed(actual_seed)
-        
-        print(f"🎨 Generating image: '{request.prompt}' (seed: {actual_seed})")
-        print("⚠️  Note: HIPBLAS warnings are expected but non-blocking")
+        # Tokenize here so the GPU thread only runs the text encoder on a miss
+        await asyncio.to_thread(pretokenize_request, request)
         
-        # Generate image with comprehensive HIPBLAS error handling
-        with torch.inference_mode():
-            # Force aggressive memory cleanup
-            import gc
-            gc.collect()
-            torch.cuda.empty_cache()
-            torch.cuda.synchronize()
-            
-            # Force memory defragmentation
-            torch.cuda.reset_peak_memory_stats()
-            
-            # Single attempt with requested parameters - fail clearly if it doesn't work
-            print(f"🎨 Generating {request.width}x{request.height} with {request.num_inference_steps} steps")
-            
-            # Force synchronization before generation
-            torch.cuda.synchronize()
-            
-            # Let model CPU offload handle device management automatically
-            result = pipeline(
-                prompt=request.prompt,
-                negative_prompt=request.negative_prompt,
-                width=request.width,
-                height=request.height,
-                num_inference_steps=request.num_inference_steps,
-                guidance_scale=request.guidance_scale,
-            )
+        # Queue for the single GPU worker and wait for our turn
+        future = asyncio.get_running_loop().create_future()
+        await generation_queue.put((request, future))
+        image, actual_seed = await future
         
-        # Convert to base64
-        image = result.images[0]
-        buffer = io.BytesIO()
-        image.save(buffer, format='PNG')
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        # Convert to base64 on a worker thread so compression doesn't block the event loop
+        image_base64 = await asyncio.to_thread(encode_image, image, request.output_format)
         
         print("✅ Image generated successfully!")
         
         return GenerateResponse(
             image_base64=image_base64,
             seed=actual_seed,
-            prompt=request.prompt
+            prompt=request.prompt,
+            format=request.output_format
         )
         
     except Exception as e:
         print(f"❌ Generation failed: {e}")
+        if isinstance(e, torch.cuda.OutOfMemoryError) or "out of memory" in str(e).lower():
+            recover_memory = True
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 @app.get("/test")
@@ -5,8 +5,9 @@ Provides a simple Python interface to the Ollama-based Qwen2.5-Coder model
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any, Iterator
-import json
+import orjson
 
 
 class QwenCoderClient:
@@ -15,6 +16,22 @@ class QwenCoderClient:
     def __init__(self, base_url: str = "http://localhost:8001"):
         self.base_url = base_url
         self.model = "qwen2.5-coder:7b"
+        
+        # Reuse keep-alive connections across generate/chat/health calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+    
+    def close(self):
+        """Close the underlying HTTP session"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def generate(
         self, 
@@ -50,11 +67,19 @@ class QwenCoderClient:
         if system:
             payload["system"] = system
         
-        response = requests.post(
+        # stream=True so tokens are read as Ollama emits them instead of
+        # after the whole response has been buffered
+        response = self.session.post(
             f"{self.base_url}/api/generate",
-            json=payload
+            json=payload,
+            stream=stream
         )
-        response.raise_for_status()
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            # An unread streamed body would keep its pooled connection
+            response.close()
+            raise
         
         if stream:
             return self._stream_response(response)
@@ -85,7 +110,7 @@ class QwenCoderClient:
             **kwargs
         }
         
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/v1/chat/completions",
             json=payload
         )
@@ -93,18 +118,25 @@ class QwenCoderClient:
         return response.json()
     
     def _stream_response(self, response: requests.Response) -> Iterator[str]:
-        """Handle streaming responses"""
-        for line in response.iter_lines():
-            if line:
-                data = json.loads(line)
-                yield data.get("response", "")
-                if data.get("done"):
-                    break
+        """
+        Handle streaming responses. The response is closed when the stream
+        ends, breaks on "done", or the iterator is closed/abandoned, so its
+        connection goes back to the session pool.
+        """
+        try:
+            for line in response.iter_lines():
+                if line:
+                    data = orjson.loads(line)
+                    yield data.get("response", "")
+                    if data.get("done"):
+                        break
+        finally:
+            response.close()
     
     def health_check(self) -> bool:
         """Check if the service is healthy"""
         try:
-            response = requests.get(f"{self.base_url}/")
+            response = self.session.get(f"{self.base_url}/")
             return response.status_code == 200
         except:
             return False
@@ -5,38 +5,111 @@ Manages lifecycle of AI services with GPU arbitration and health monitoring
 """
 
 import os
-import subprocess
+import time
+import pickle
+import asyncio
+import hashlib
+import threading
 import yaml
+from collections import defaultdict
+from contextlib import asynccontextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-import requests
+import httpx
 import docker
 
+# libyaml C parser when PyYAML was built with it, pure-Python otherwise
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 # Constants
 SERVICES_DIR = Path(os.environ.get("SERVICES_DIR", "/home/zack/ai-workspace/services"))
 SERVICE_MANIFEST = "service.yaml"
 
-# Docker client
-try:
-    docker_client = docker.from_env()
-except Exception as e:
-    print(f"⚠️ Warning: Could not connect to Docker: {e}")
+# Pickled registry snapshots, named by a hash of every manifest's path, mtime
+# and size. SERVICES_DIR is mounted read-only, so they live next to the app.
+REGISTRY_CACHE_DIR = Path(
+    os.environ.get("REGISTRY_CACHE_DIR", Path(__file__).resolve().parent / ".cache")
+)
+
+# Health results are reused for HEALTH_CACHE_TTL seconds, and concurrent
+# checks of the same URL share one in-flight request
+HEALTH_CHECK_TIMEOUT = 2.0
+HEALTH_CACHE_TTL = 2.0
+
+# Docker client and shared HTTP client for health checks (keep-alive
+# connections are reused across checks). Both are created in lifespan().
+docker_client = None
+http_client = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect to Docker, discover services and watch Docker events; clean up on exit"""
+    global docker_client, http_client
+    
+    try:
+        docker_client = await asyncio.to_thread(docker.from_env)
+    except Exception as e:
+        print(f"⚠️ Warning: Could not connect to Docker: {e}")
+    
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=HEALTH_CHECK_TIMEOUT
+    )
+    
+    await asyncio.to_thread(discover_services)
+    events_task = None
+    if docker_client is not None:
+        events_task = asyncio.create_task(docker_event_consumer())
+    
+    yield
+    
+    docker_events_stop.set()
+    if docker_events is not None:
+        docker_events.close()
+    if events_task is not None:
+        events_task.cancel()
+    await http_client.aclose()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Service Nanny",
     description="AI Service Orchestrator with GPU arbitration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Global state
 services_registry = {}
 running_services = {}
 gpu_service_running = None
+gpu_services = set()  # names of services with gpu_required, rebuilt on discovery
+
+# One lock per service so concurrent start/stop calls don't run compose for
+# the same project twice. GPU starts also take gpu_arbitration_lock first,
+# so two GPU starts can't race (or deadlock) stopping each other.
+service_locks = defaultdict(asyncio.Lock)
+gpu_arbitration_lock = asyncio.Lock()
+
+health_results = {}   # health URL -> (time.monotonic() when checked, healthy)
+health_inflight = {}  # health URL -> asyncio.Task running the check
+
+# Running containers per compose project, kept current by the Docker events
+# stream so status checks don't query dockerd: project -> {container ids}
+project_containers = {}
+project_containers_lock = threading.Lock()  # watcher thread writes, event loop reads
+docker_events_live = False
+docker_events = None
+docker_events_stop = threading.Event()
+DOCKER_EVENT_FILTERS = {"type": "container", "event": ["start", "die", "stop", "destroy"]}
 
 # Models
 class ServiceInfo(BaseModel):
@@ -66,59 +139,120 @@ class ServiceListResponse(BaseModel):
     services: List[ServiceInfo]
     gpu_service_running: Optional[str] = None
 
+# Parsed manifests keyed by path, reused while (mtime_ns, size) is unchanged:
+# path -> (st_mtime_ns, st_size, manifest)
+manifest_cache = {}
+
 # Service Discovery
-def discover_services():
-    """Scan services directory for service.yaml manifests"""
-    global services_registry
-    services_registry = {}
+def load_manifest(manifest_path: Path, st: Optional[os.stat_result] = None) -> dict:
+    """Parse a service.yaml, reusing the cached result if the file is unchanged"""
+    if st is None:
+        st = manifest_path.stat()
+    cached = manifest_cache.get(manifest_path)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
     
-    print(f"🔍 Discovering services in {SERVICES_DIR}")
+    with open(manifest_path, 'rb') as f:
+        manifest = yaml.load(f.read(), Loader=YamlLoader)
     
-    for item in SERVICES_DIR.iterdir():
-        if not item.is_dir():
-            continue
-        
-        # Skip template and service-nanny itself
-        if item.name.startswith("_") or item.name == "service-nanny" or item.name.startswith("."):
-            continue
-        
-        manifest_path = item / SERVICE_MANIFEST
-        if not manifest_path.exists():
-            print(f"⚠️  No service.yaml found in {item.name}")
-            continue
-        
-        try:
-            with open(manifest_path, 'r') as f:
-                manifest = yaml.safe_load(f)
+    manifest_cache[manifest_path] = (st.st_mtime_ns, st.st_size, manifest)
+    return manifest
+
+def find_manifests() -> list:
+    """
+    Return (service_dir, manifest_path, manifest_stat) for every candidate
+    service. os.scandir reports directory-ness without an extra stat per
+    entry, and names are filtered before touching the disk, so each
+    candidate costs one stat of its manifest, reused for the cache checks.
+    """
+    manifests = []
+    
+    with os.scandir(SERVICES_DIR) as entries:
+        for entry in entries:
+            # Skip template and service-nanny itself
+            if entry.name.startswith("_") or entry.name == "service-nanny" or entry.name.startswith("."):
+                continue
             
-            service_name = manifest.get("name", item.name)
-            services_registry[service_name] = {
-                "manifest": manifest,
-                "path": item,
-                "discovered_at": datetime.now().isoformat()
-            }
+            if not entry.is_dir():
+                continue
             
-            print(f"✅ Discovered: {service_name}")
+            manifest_path = Path(entry.path) / SERVICE_MANIFEST
+            try:
+                st = manifest_path.stat()
+            except FileNotFoundError:
+                print(f"⚠️  No service.yaml found in {entry.name}")
+                continue
             
-        except Exception as e:
-            print(f"❌ Error loading {item.name}/service.yaml: {e}")
+            manifests.append((Path(entry.path), manifest_path, st))
     
-    print(f"📊 Total services discovered: {len(services_registry)}")
-    return services_registry
+    return sorted(manifests, key=lambda candidate: candidate[0])
 
-def get_service_info(service_name: str) -> ServiceInfo:
-    """Convert registry entry to ServiceInfo model"""
-    if service_name not in services_registry:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
+def registry_cache_path(manifests: list) -> Path:
+    """Cache file for this exact set of manifest versions"""
+    digest = hashlib.blake2b(digest_size=16)
+    for _, manifest_path, st in manifests:
+        digest.update(f"{manifest_path}|{st.st_mtime_ns}|{st.st_size}\n".encode())
+    return REGISTRY_CACHE_DIR / f"registry.{digest.hexdigest()}.pkl"
+
+def load_registry_cache(cache_path: Path) -> Optional[dict]:
+    """Load a pickled registry, rehydrating service paths; None on a miss"""
+    try:
+        with open(cache_path, 'rb') as f:
+            registry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable registry cache {cache_path.name}: {e}")
+        return None
     
-    entry = services_registry[service_name]
-    manifest = entry["manifest"]
+    for entry in registry.values():
+        entry["path"] = Path(entry["path"])
+    return registry
+
+def save_registry_cache(cache_path: Path, registry: dict):
+    """Pickle the registry (paths as strings, no derived fields) and drop older snapshots"""
+    snapshot = {
+        name: {
+            "manifest": entry["manifest"],
+            "path": str(entry["path"]),
+            "discovered_at": entry["discovered_at"]
+        }
+        for name, entry in registry.items()
+    }
     
-    # Determine status
-    status = "stopped"
-    if service_name in running_services:
-        status = "running"
+    try:
+        REGISTRY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        
+        for old_path in REGISTRY_CACHE_DIR.glob("registry.*.pkl"):
+            if old_path != cache_path:
+                old_path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"⚠️  Could not write registry cache: {e}")
+
+def load_service_entry(candidate: tuple) -> Optional[tuple]:
+    """Parse one candidate's manifest into (service_name, registry entry); None on error"""
+    item, manifest_path, st = candidate
+    try:
+        manifest = load_manifest(manifest_path, st)
+        if not isinstance(manifest, dict):
+            raise ValueError(f"expected a mapping, got {type(manifest).__name__}")
+        service_name = manifest.get("name", item.name)
+    except Exception as e:
+        print(f"❌ Error loading {item.name}/service.yaml: {e}")
+        return None
     
+    return service_name, {
+        "manifest": manifest,
+        "path": item,
+        "discovered_at": datetime.now().isoformat()
+    }
+
+def build_service_info(service_name: str, manifest: dict) -> ServiceInfo:
+    """Validate the static manifest fields once; status is filled in per read"""
     return ServiceInfo(
         name=manifest.get("name", service_name),
         description=manifest.get("description", "No description"),
@@ -128,32 +262,202 @@ def get_service_info(service_name: str) -> ServiceInfo:
         ports=manifest.get("ports", []),
         health_endpoint=manifest.get("health_endpoint", ""),
         tags=manifest.get("tags", []),
-        status=status
+        status="stopped"
     )
 
-def check_service_health(service_name: str) -> bool:
-    """Check if a service is healthy via its health endpoint"""
-    if service_name not in services_registry:
-        return False
+def index_registry(registry: dict) -> set:
+    """Precompute each entry's ServiceInfo and health URL; returns the gpu_services index"""
+    for name, entry in list(registry.items()):
+        try:
+            entry["info"] = build_service_info(name, entry["manifest"])
+        except Exception as e:
+            print(f"❌ Invalid manifest for {name}: {e}")
+            del registry[name]
+            continue
+        
+        # Replace localhost with host.docker.internal for container-to-host communication
+        health_endpoint = entry["manifest"].get("health_endpoint") or ""
+        entry["health_url"] = health_endpoint.replace("localhost", "host.docker.internal")
+    
+    return {
+        name for name, entry in registry.items()
+        if entry["manifest"].get("gpu_required", False)
+    }
+
+def discover_services():
+    """
+    Scan services directory for service.yaml manifests (blocking - run it
+    with asyncio.to_thread). The new registry is built aside and swapped in
+    at the end, so readers never see a partial one.
+    """
+    global services_registry, gpu_services
     
-    manifest = services_registry[service_name]["manifest"]
-    health_endpoint = manifest.get("health_endpoint")
+    print(f"🔍 Discovering services in {SERVICES_DIR}")
     
-    if not health_endpoint:
-        return False
+    manifests = find_manifests()
     
-    # Replace localhost with host.docker.internal for container-to-host communication
-    health_endpoint = health_endpoint.replace("localhost", "host.docker.internal")
+    # Skip parsing entirely when no manifest changed since the last snapshot
+    cache_path = registry_cache_path(manifests)
+    registry = load_registry_cache(cache_path)
+    if registry is not None:
+        gpu_index = index_registry(registry)
+        services_registry, gpu_services = registry, gpu_index
+        print(f"⚡ Loaded {len(registry)} services from registry cache")
+        return registry
     
+    # Overlap manifest reads (SERVICES_DIR may be on a slow or network mount)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(load_service_entry, manifests))
+    
+    registry = {}
+    for result in results:
+        if result is None:
+            continue
+        service_name, entry = result
+        registry[service_name] = entry
+        print(f"✅ Discovered: {service_name}")
+    
+    gpu_index = index_registry(registry)
+    
+    save_registry_cache(cache_path, registry)
+    
+    services_registry, gpu_services = registry, gpu_index
+    print(f"📊 Total services discovered: {len(registry)}")
+    return registry
+
+def get_service_info(service_name: str) -> ServiceInfo:
+    """Look up a registry entry and convert it to a ServiceInfo model"""
+    entry = services_registry.get(service_name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
+    
+    return entry_to_info(service_name, entry)
+
+def entry_to_info(service_name: str, entry: dict) -> ServiceInfo:
+    """Convert registry entry to ServiceInfo model"""
+    status = "running" if service_name in running_services else "stopped"
+    return entry["info"].model_copy(update={"status": status})
+
+async def probe_health(service_name: str, health_url: str) -> bool:
+    """GET the health URL once and record the result"""
     try:
-        response = requests.get(health_endpoint, timeout=5)
-        return response.status_code == 200
+        response = await http_client.get(health_url)
+        healthy = response.status_code == 200
     except Exception as e:
         print(f"Health check failed for {service_name}: {e}")
+        healthy = False
+    
+    health_results[health_url] = (time.monotonic(), healthy)
+    return healthy
+
+async def check_service_health(service_name: str) -> bool:
+    """Check if a service is healthy via its health endpoint"""
+    entry = services_registry.get(service_name)
+    health_url = entry["health_url"] if entry is not None else ""
+    
+    if not health_url:
         return False
+    
+    cached = health_results.get(health_url)
+    if cached is not None and time.monotonic() - cached[0] < HEALTH_CACHE_TTL:
+        return cached[1]
+    
+    # Join an in-flight check for this URL instead of issuing another one
+    task = health_inflight.get(health_url)
+    if task is None:
+        task = asyncio.create_task(probe_health(service_name, health_url))
+        health_inflight[health_url] = task
+        task.add_done_callback(lambda _: health_inflight.pop(health_url, None))
+    
+    # Shielded so one caller disconnecting doesn't cancel the shared check
+    return await asyncio.shield(task)
+
+def sync_project_containers():
+    """Rebuild project_containers from a full container listing"""
+    global project_containers
+    
+    containers = {}
+    for c in docker_client.containers.list():
+        project = c.labels.get("com.docker.compose.project")
+        if project:
+            containers.setdefault(project, set()).add(c.id)
+    with project_containers_lock:
+        project_containers = containers
+
+def apply_docker_event(event: dict):
+    """Update project_containers from one container start/die/stop/destroy event"""
+    actor = event.get("Actor", {})
+    project = actor.get("Attributes", {}).get("com.docker.compose.project")
+    if not project:
+        return
+    
+    container_id = event.get("id") or actor.get("ID")
+    action = event.get("Action") or event.get("status")
+    
+    with project_containers_lock:
+        if action == "start":
+            project_containers.setdefault(project, set()).add(container_id)
+        else:
+            ids = project_containers.get(project)
+            if ids is not None:
+                ids.discard(container_id)
+                if not ids:
+                    project_containers.pop(project, None)
+
+def watch_docker_events():
+    """Consume the Docker events stream until shutdown (blocking - run in a thread)"""
+    global docker_events, docker_events_live
+    
+    while not docker_events_stop.is_set():
+        try:
+            docker_events = docker_client.events(decode=True, filters=DOCKER_EVENT_FILTERS)
+            # Resync after subscribing so nothing that happened in between is lost
+            sync_project_containers()
+            docker_events_live = True
+            for event in docker_events:
+                apply_docker_event(event)
+        except Exception as e:
+            if not docker_events_stop.is_set():
+                print(f"⚠️  Docker events stream failed: {e}")
+        
+        docker_events_live = False
+        if docker_events_stop.wait(5):
+            break
+
+async def docker_event_consumer():
+    """Background task that keeps project_containers in sync with dockerd"""
+    await asyncio.to_thread(watch_docker_events)
+
+def snapshot_projects() -> set:
+    """Compose project names with at least one running container (one Docker API call)"""
+    if docker_events_live:
+        with project_containers_lock:
+            return {project for project, ids in project_containers.items() if ids}
+    
+    try:
+        return {
+            c.labels.get("com.docker.compose.project")
+            for c in docker_client.containers.list()
+        }
+    except Exception as e:
+        print(f"Error listing Docker containers: {e}")
+        return set()
 
-def get_docker_compose_status(service_path: Path) -> bool:
-    """Check if docker-compose service is running using Docker SDK"""
+def get_docker_compose_status(service_path: Path, projects: Optional[set] = None) -> bool:
+    """
+    Check if docker-compose service is running using Docker SDK.
+    
+    Pass a snapshot_projects() result when checking many services so they
+    share a single container listing.
+    """
+    if projects is not None:
+        return service_path.name in projects
+    
+    # Served from the events stream when it is connected
+    if docker_events_live:
+        with project_containers_lock:
+            return bool(project_containers.get(service_path.name))
+    
     try:
         # Get project name from directory name
         project_name = service_path.name
@@ -168,12 +472,81 @@ def get_docker_compose_status(service_path: Path) -> bool:
         print(f"Error checking Docker status for {service_path.name}: {e}")
         return False
 
-# API Endpoints
+def list_project_containers(service_path: Path) -> list:
+    """All containers (running or not) of the service's compose project, by name"""
+    containers = docker_client.containers.list(
+        all=True,
+        filters={"label": f"com.docker.compose.project={service_path.name}"}
+    )
+    return sorted(containers, key=lambda c: c.name)
+
+def read_project_logs(service_path: Path, tail: int) -> str:
+    """
+    Last `tail` log lines of each project container via the Docker API,
+    prefixed like `docker compose logs` (blocking - run off the event loop).
+    """
+    lines = []
+    for container in list_project_containers(service_path):
+        prefix = container.labels.get("com.docker.compose.service", container.name)
+        text = container.logs(tail=tail).decode(errors="replace")
+        lines.extend(f"{prefix}  | {line}" for line in text.splitlines())
+    
+    return "\n".join(lines) + "\n" if lines else ""
 
-@app.on_event("startup")
-async def startup_event():
-    """Discover services on startup"""
-    discover_services()
+def iter_project_logs(containers: list, tail: int):
+    """
+    Yield prefixed log lines container by container as Docker streams them,
+    in the same format as read_project_logs (blocking iterator -
+    StreamingResponse drives it from its threadpool).
+    
+    Stream chunks are not lines: TTY containers arrive a byte at a time and
+    multiplexed frames can split or merge lines, so chunks are buffered and
+    only complete lines are prefixed and emitted.
+    """
+    for container in containers:
+        prefix = f"{container.labels.get('com.docker.compose.service', container.name)}  | ".encode()
+        pending = b""
+        for chunk in container.logs(stream=True, follow=False, tail=tail):
+            pending += chunk
+            if b"\n" not in pending:
+                continue
+            *lines, pending = pending.split(b"\n")
+            yield b"".join(prefix + line.rstrip(b"\r") + b"\n" for line in lines)
+        if pending:
+            yield prefix + pending.rstrip(b"\r") + b"\n"
+
+async def get_docker_compose_status_async(service_path: Path) -> bool:
+    """get_docker_compose_status without blocking the loop when it has to query dockerd"""
+    if docker_events_live:
+        return get_docker_compose_status(service_path)
+    return await asyncio.to_thread(get_docker_compose_status, service_path)
+
+async def run_compose(service_path: Path, *args: str, timeout: float):
+    """
+    Run `docker compose <args>` in service_path without blocking the event loop.
+    
+    Returns:
+        (returncode, stdout, stderr)
+    
+    Raises:
+        asyncio.TimeoutError if the command runs longer than timeout seconds
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "docker", "compose", *args,
+        cwd=str(service_path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+    
+    return proc.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+# API Endpoints
 
 @app.get("/")
 async def root():
@@ -197,7 +570,7 @@ async def health():
 @app.get("/services", response_model=ServiceListResponse)
 async def list_services():
     """List all discovered services"""
-    services = [get_service_info(name) for name in services_registry.keys()]
+    services = [entry_to_info(name, entry) for name, entry in services_registry.items()]
     
     return ServiceListResponse(
         total=len(services),
@@ -217,8 +590,12 @@ async def get_service_status(service_name: str):
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     
     service_path = services_registry[service_name]["path"]
-    is_running = get_docker_compose_status(service_path)
-    is_healthy = check_service_health(service_name) if is_running else False
+    # Docker and HTTP probes are independent, so run them together
+    is_running, is_healthy = await asyncio.gather(
+        get_docker_compose_status_async(service_path),
+        check_service_health(service_name)
+    )
+    is_healthy = is_healthy and is_running
     
     status = "stopped"
     uptime = None
@@ -226,9 +603,9 @@ async def get_service_status(service_name: str):
     if is_running:
         status = "running" if is_healthy else "unhealthy"
         if service_name in running_services:
-            started_at = running_services[service_name].get("started_at")
-            if started_at:
-                uptime = str(datetime.now() - datetime.fromisoformat(started_at))
+            started_at_mono = running_services[service_name].get("started_at_mono")
+            if started_at_mono is not None:
+                uptime = str(timedelta(seconds=time.monotonic() - started_at_mono))
     
     return ServiceStatus(
         name=service_name,
@@ -241,11 +618,17 @@ async def get_service_status(service_name: str):
 @app.post("/services/{service_name}/start")
 async def start_service(service_name: str, request: StartServiceRequest = StartServiceRequest(force=True)):
     """Start a service (automatically stops conflicting GPU services by default)"""
-    global gpu_service_running, running_services
-    
     if service_name not in services_registry:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     
+    gpu_required = services_registry[service_name]["manifest"].get("gpu_required", False)
+    async with (gpu_arbitration_lock if gpu_required else nullcontext()), service_locks[service_name]:
+        return await run_start_service(service_name, request)
+
+async def run_start_service(service_name: str, request: StartServiceRequest):
+    """Start a service; the caller holds its lock, so the running check below is current"""
+    global gpu_service_running, running_services
+    
     entry = services_registry[service_name]
     manifest = entry["manifest"]
     service_path = entry["path"]
@@ -257,11 +640,11 @@ async def start_service(service_name: str, request: StartServiceRequest = StartS
     # GPU arbitration - automatically detect and stop running GPU services
     if manifest.get("gpu_required", False):
         # Check if any GPU services are currently running (not just tracked ones)
-        running_gpu_services = []
-        for svc_name, svc_entry in services_registry.items():
-            if svc_name != service_name and svc_entry["manifest"].get("gpu_required", False):
-                if get_docker_compose_status(svc_entry["path"]):
-                    running_gpu_services.append(svc_name)
+        projects = snapshot_projects()
+        running_gpu_services = sorted(
+            svc_name for svc_name in gpu_services - {service_name}
+            if get_docker_compose_status(services_registry[svc_name]["path"], projects)
+        )
         
         if running_gpu_services:
             if not request.force:
@@ -270,32 +653,27 @@ async def start_service(service_name: str, request: StartServiceRequest = StartS
                     detail=f"GPU service(s) {running_gpu_services} already running. Use force=true to stop them first."
                 )
             else:
-                # Stop all running GPU services
-                for svc_name in running_gpu_services:
-                    print(f"🛑 Auto-stopping GPU service: {svc_name}")
-                    await stop_service(svc_name)
+                # Stop all running GPU services concurrently - they are
+                # separate compose projects
+                print(f"🛑 Auto-stopping GPU service(s): {', '.join(running_gpu_services)}")
+                await asyncio.gather(*(stop_service(svc_name) for svc_name in running_gpu_services))
     
     # Start the service
     print(f"🚀 Starting {service_name}...")
     
     try:
-        result = subprocess.run(
-            ["docker", "compose", "up", "-d"],
-            cwd=service_path,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
+        returncode, _, stderr = await run_compose(service_path, "up", "-d", timeout=120)
         
-        if result.returncode != 0:
+        if returncode != 0:
             raise HTTPException(
                 status_code=500,
-                detail=f"Failed to start service: {result.stderr}"
+                detail=f"Failed to start service: {stderr}"
             )
         
         # Track running service
         running_services[service_name] = {
             "started_at": datetime.now().isoformat(),
+            "started_at_mono": time.monotonic(),  # for uptime; immune to clock changes
             "manifest": manifest
         }
         
@@ -310,7 +688,7 @@ async def start_service(service_name: str, request: StartServiceRequest = StartS
             "health_endpoint": manifest.get("health_endpoint")
         }
         
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=500, detail="Service start timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting service: {str(e)}")
@@ -318,11 +696,16 @@ async def start_service(service_name: str, request: StartServiceRequest = StartS
 @app.post("/services/{service_name}/stop")
 async def stop_service(service_name: str):
     """Stop a service"""
-    global gpu_service_running, running_services
-    
     if service_name not in services_registry:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     
+    async with service_locks[service_name]:
+        return await run_stop_service(service_name)
+
+async def run_stop_service(service_name: str):
+    """Stop a service; the caller holds its lock, so the running check below is current"""
+    global gpu_service_running, running_services
+    
     entry = services_registry[service_name]
     service_path = entry["path"]
     
@@ -334,18 +717,12 @@ async def stop_service(service_name: str):
     print(f"🛑 Stopping {service_name}...")
     
     try:
-        result = subprocess.run(
-            ["docker", "compose", "down"],
-            cwd=service_path,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        returncode, _, stderr = await run_compose(service_path, "down", timeout=60)
         
-        if result.returncode != 0:
+        if returncode != 0:
             raise HTTPException(
                 status_code=500,
-                detail=f"Failed to stop service: {result.stderr}"
+                detail=f"Failed to stop service: {stderr}"
             )
         
         # Update state
@@ -362,14 +739,14 @@ async def stop_service(service_name: str):
             "status": "stopped"
         }
         
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=500, detail="Service stop timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error stopping service: {str(e)}")
 
 @app.get("/services/{service_name}/logs")
-async def get_service_logs(service_name: str, tail: int = 100):
-    """Get logs for a service"""
+async def get_service_logs(service_name: str, tail: int = 100, stream: bool = False):
+    """Get logs for a service (stream=true returns them as a plain-text stream)"""
     if service_name not in services_registry:
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found")
     
@@ -377,27 +754,30 @@ async def get_service_logs(service_name: str, tail: int = 100):
     service_path = entry["path"]
     
     try:
-        result = subprocess.run(
-            ["docker", "compose", "logs", "--tail", str(tail)],
-            cwd=service_path,
-            capture_output=True,
-            text=True,
+        if stream:
+            containers = await asyncio.to_thread(list_project_containers, service_path)
+            return StreamingResponse(iter_project_logs(containers, tail), media_type="text/plain")
+        
+        logs = await asyncio.wait_for(
+            asyncio.to_thread(read_project_logs, service_path, tail),
             timeout=30
         )
         
         return {
             "service": service_name,
-            "logs": result.stdout,
+            "logs": logs,
             "tail": tail
         }
         
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=500, detail="Log retrieval timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting logs: {str(e)}")
 
 @app.post("/rediscover")
 async def rediscover_services():
     """Manually trigger service discovery"""
-    discover_services()
+    await asyncio.to_thread(discover_services)
     return {
         "message": "Service discovery completed",
         "services_discovered": len(services_registry)
@@ -408,9 +788,14 @@ if __name__ == "__main__":
     print(f"📂 Services directory: {SERVICES_DIR}")
     print("🚀 Starting API server...")
     
+    # Run the server (uvloop + httptools require uvicorn[standard]). Registry
+    # and running-service state live in process memory, so stay at one worker.
     uvicorn.run(
-        app,
+        "service_nanny:app",
         host="0.0.0.0",
         port=8080,
+        loop="uvloop",
+        http="httptools",
+        workers=1,
         log_level="info"
     )